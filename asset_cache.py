@@ -0,0 +1,128 @@
+import os
+import glob
+import hashlib
+import logging
+
+import numpy as np
+from PIL import Image
+
+from framebuffer import RGB565, image_to_rgb565
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(current_dir, 'cache')
+
+# How a picture is mapped onto the panel:
+#   stretch   - scale to the panel exactly, ignoring aspect ratio
+#   fill      - scale to cover the panel and crop the overflow from the centre
+#   letterbox - scale to fit inside the panel, centred on a background colour
+#   fit       - like letterbox, but never enlarge small pictures
+FIT_POLICIES = ("stretch", "fill", "letterbox", "fit")
+
+
+def fit_size(size, target, policy):
+    # Size the source is scaled to before cropping / centring
+    (w, h), (tw, th) = size, target
+    if policy == "stretch":
+        return tw, th
+    if policy == "fill":
+        scale = max(tw / w, th / h)
+    elif policy == "letterbox":
+        scale = min(tw / w, th / h)
+    elif policy == "fit":
+        scale = min(tw / w, th / h, 1.0)
+    else:
+        raise ValueError(f"Unknown fit policy {policy!r}, expected one of {FIT_POLICIES}.")
+    return max(1, round(w * scale)), max(1, round(h * scale))
+
+
+def fit_image(image, target, policy="letterbox", background=(0, 0, 0)):
+    scaled = fit_size(image.size, target, policy)
+
+    # JPEG decoders can downscale by 1/2, 1/4 or 1/8 while decoding, so large
+    # camera snapshots never get decoded at full resolution
+    image.draft("RGB", scaled)
+    image = image.convert("RGB")
+
+    # reducing_gap shrinks with a cheap box reduce first, then LANCZOS for the rest
+    if image.size != scaled:
+        image = image.resize(scaled, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+    tw, th = target
+    if image.size == (tw, th):
+        return image
+    if policy == "fill":
+        left, top = (image.width - tw) // 2, (image.height - th) // 2
+        return image.crop((left, top, left + tw, top + th))
+    canvas = Image.new("RGB", (tw, th), background)
+    canvas.paste(image, ((tw - image.width) // 2, (th - image.height) // 2))
+    return canvas
+
+
+class AssetCache:
+    """Images pre-converted to the panel's geometry and stored as raw RGB565.
+
+    Each source image becomes one .565 file, keyed by source path, mtime and
+    panel. Files are memory-mapped on use, so showing a stored picture is an
+    mmap plus one SPI write instead of a decode, resize and colour conversion.
+    """
+
+    def __init__(self, width, height, panel="", cache_dir=CACHE_DIR, policy="letterbox",
+                 background=(0, 0, 0)):
+        self.width = width
+        self.height = height
+        self.panel = panel
+        self.policy = policy
+        self.background = background
+        self.cache_dir = os.path.join(cache_dir, "assets")
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # Open maps by (source path, policy), with the version they were made from
+        self._maps = {}
+
+    def _names(self, path, policy):
+        # <source id>-<version>.565: the source id groups every version of one
+        # image for this panel and policy, the version changes with the file
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        source = f"{path}|{self.panel}|{self.width}x{self.height}|{policy}|{self.background}"
+        version = f"{st.st_mtime_ns}|{st.st_size}"
+        return (hashlib.sha1(source.encode()).hexdigest()[:16],
+                hashlib.sha1(version.encode()).hexdigest()[:12])
+
+    def get(self, path, policy=None):
+        policy = policy or self.policy
+        source, version = self._names(path, policy)
+        cached = self._maps.get((path, policy))
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        file = os.path.join(self.cache_dir, f"{source}-{version}.565")
+        if not os.path.exists(file):
+            self._convert(path, file, policy)
+            self._prune(source, file)
+        buf = np.memmap(file, dtype=RGB565, mode="r", shape=(self.height, self.width))
+        self._maps[(path, policy)] = (version, buf)
+        return buf
+
+    def render(self, image, policy=None):
+        # Fit to the panel geometry and convert to RGB565
+        image = fit_image(image, (self.width, self.height), policy or self.policy, self.background)
+        return image_to_rgb565(image)
+
+    def _convert(self, path, file, policy):
+        logging.debug(f"Converting {path} to RGB565 ({policy}).")
+        with Image.open(path) as image:
+            buf = self.render(image, policy)
+        # Write next to the target and rename, so readers never map a partial file
+        tmp = file + ".tmp"
+        buf.tofile(tmp)
+        os.replace(tmp, file)
+
+    def _prune(self, source, keep):
+        # Older versions of the same image for this panel are dead weight
+        for old in glob.glob(os.path.join(self.cache_dir, f"{source}-*.565")):
+            if old != keep:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
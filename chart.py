@@ -0,0 +1,422 @@
+import math
+from collections import OrderedDict, deque, namedtuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from decimate import decimate_indices
+from framebuffer import FrameBuffer
+from rollups import mean
+from smoothing import smooth
+from text_layout import DEFAULT_FONT, get_font, text_width
+
+# Same 10% headroom plot_scatter gave plotly's axis ranges
+AXIS_MARGIN_PERCENT = 10 / 100
+
+BACKGROUND = (39, 39, 39)
+GRID_COLOR = (70, 70, 70)
+LABEL_COLOR = (200, 200, 200)
+MOIST_COLOR = "royalblue"
+TEMP_COLOR = "orangered"
+
+TICK_FONT_SIZE = 8
+TITLE_FONT_SIZE = 9
+
+# Where the axes sit in a frame: plot rectangle (x, y, w, h), time span in
+# epoch seconds and the left (moisture) and right (temperature) value ranges
+ChartAxes = namedtuple("ChartAxes", "box t0 t1 left right")
+
+
+def to_epoch(ts):
+    # datetime64 / pandas timestamps or plain epoch seconds -> int64 seconds
+    ts = np.asarray(ts)
+    if np.issubdtype(ts.dtype, np.datetime64):
+        return ts.astype("datetime64[s]").astype(np.int64)
+    return ts.astype(np.int64, copy=False)
+
+
+def axis_range(lo, hi, upper=None):
+    # Pad by the margin on both sides, never below 0 and never above `upper`
+    margin = (hi - lo) * AXIS_MARGIN_PERCENT
+    lo, hi = max(lo - margin, 0), hi + margin
+    if upper is not None:
+        hi = min(hi, upper)
+    if hi <= lo:
+        # Flat series: give it a unit band so it draws mid-height
+        lo, hi = max(lo - 0.5, 0), lo + 0.5
+    return float(lo), float(hi)
+
+
+def nice_step(lo, hi, count=3):
+    # 1, 2 or 5 times a power of ten, about (hi - lo) / count
+    raw = (hi - lo) / max(count, 1)
+    step = 10 ** math.floor(math.log10(raw)) if raw > 0 else 1
+    for factor in (1, 2, 5, 10):
+        if raw <= step * factor:
+            return step * factor
+    return step
+
+
+def nice_ticks(lo, hi, count=3):
+    # Round-number tick values inside [lo, hi]
+    step = nice_step(lo, hi, count)
+    first = math.ceil(lo / step) * step
+    return [first + i * step for i in range(int((hi - first) // step) + 1)]
+
+
+def _label(value, step):
+    # As many decimals as the tick step needs, so neighbouring ticks differ
+    decimals = max(0, -math.floor(math.log10(step))) if step > 0 else 0
+    return f"{value:.{decimals}f}"
+
+
+def _time_label(t, span=0):
+    # HH:MM, or MM-DD once the chart covers more than two days
+    text = str(np.datetime64(int(t), "s"))
+    return text[5:10] if span > 2 * 86400 else text[11:16]
+
+
+def plot_box(width, height):
+    # Room for tick labels on both sides, the title above and times below
+    left = right = max(18, width // 10)
+    top, bottom = TITLE_FONT_SIZE + 4, TICK_FONT_SIZE + 5
+    return left, top, width - left - right, height - top - bottom
+
+
+def to_pixels(axes, t, v, value_range):
+    # Map samples to plot-area pixel coordinates (floats)
+    x, y, w, h = axes.box
+    lo, hi = value_range
+    span = max(axes.t1 - axes.t0, 1)
+    px = x + (np.asarray(t, dtype=np.float64) - axes.t0) * (w - 1) / span
+    py = y + (hi - np.asarray(v, dtype=np.float64)) * (h - 1) / (hi - lo)
+    return px, py
+
+
+def draw_series(frame, axes, t, v, value_range, color, width=1, curve=False, clip=None):
+    # Rasterize the polyline into an alpha mask of the plot area and blend it in
+    x, y, w, h = clip or axes.box
+    if len(t) == 0 or w <= 0:
+        return
+    px, py = to_pixels(axes, t, v, value_range)
+    points = list(zip((px - x).tolist(), (py - y).tolist()))
+    mask = Image.new("L", (w, h), 0)
+    draw = ImageDraw.Draw(mask)
+    if len(points) == 1:
+        draw.point(points, fill=255)
+    else:
+        draw.line(points, fill=255, width=width, joint="curve" if curve else None)
+    frame.mask(x, y, np.asarray(mask), color)
+
+
+def draw_axes(frame, axes, title="", scaled=True, font_path=DEFAULT_FONT, time_labels=True):
+    # Grid, tick labels and title around the plot area
+    x, y, w, h = axes.box
+    font = get_font(font_path, TICK_FONT_SIZE)
+    frame.fill_rect(0, 0, frame.width, frame.height, BACKGROUND)
+
+    left_color = MOIST_COLOR if scaled else LABEL_COLOR
+    step = nice_step(*axes.left)
+    for value in nice_ticks(*axes.left):
+        _, py = to_pixels(axes, [axes.t0], [value], axes.left)
+        row = int(round(py[0]))
+        frame.line(x, row, x + w - 1, row, GRID_COLOR)
+        label = _label(value, step)
+        frame.text((x - 2 - text_width(font_path, TICK_FONT_SIZE, label), row - TICK_FONT_SIZE // 2),
+                   label, font, left_color)
+    if scaled:
+        step = nice_step(*axes.right)
+        for value in nice_ticks(*axes.right):
+            _, py = to_pixels(axes, [axes.t0], [value], axes.right)
+            frame.text((x + w + 2, int(round(py[0])) - TICK_FONT_SIZE // 2), _label(value, step),
+                       font, TEMP_COLOR)
+
+    frame.rect(x - 1, y - 1, w + 2, h + 2, GRID_COLOR)
+    for t in np.linspace(axes.t0, axes.t1, 3) if time_labels else ():
+        label = _time_label(t, axes.t1 - axes.t0)
+        px, _ = to_pixels(axes, [t], [axes.left[0]], axes.left)
+        lw = text_width(font_path, TICK_FONT_SIZE, label)
+        left = min(max(int(px[0] - lw / 2), 0), frame.width - int(lw))
+        frame.text((left, y + h + 3), label, font, LABEL_COLOR)
+
+    if title:
+        title_font = get_font(font_path, TITLE_FONT_SIZE)
+        tw = text_width(font_path, TITLE_FONT_SIZE, title)
+        frame.text(((frame.width - tw) / 2, 1), title, title_font, LABEL_COLOR)
+
+
+def chart_axes(ts, moist, temp, width, height, scaled=True, extent=None):
+    # Axis ranges exactly as plot_scatter computed them for plotly. `extent`
+    # is (moist_min, moist_max, temp_min, temp_max) when already known.
+    box = plot_box(width, height)
+    if len(ts) == 0:
+        return ChartAxes(box, 0, 1, (0.0, 1.0), (0.0, 1.0))
+    t0, t1 = int(ts[0]), int(ts[-1])
+    if extent is None:
+        extent = (np.min(moist), np.max(moist), np.min(temp), np.max(temp))
+    moist_lo, moist_hi, temp_lo, temp_hi = (float(v) for v in extent)
+    if scaled:
+        left = axis_range(moist_lo, moist_hi, upper=100)  # moisture is a percentage
+        right = axis_range(temp_lo, temp_hi)
+    else:
+        # One shared axis for both series
+        left = right = axis_range(min(moist_lo, temp_lo), max(moist_hi, temp_hi))
+    return ChartAxes(box, t0, t1, left, right)
+
+
+def chart_title(last_n_hours=None):
+    return f"Last {last_n_hours} h" if last_n_hours else "All data"
+
+
+def render_chart(ts, moist, temp, width=240, height=135, scaled=True, last_n_hours=None,
+                 smoothing=0, font_path=DEFAULT_FONT, decimation="minmax", extent=None, title=None):
+    # Dual-axis moisture / temperature line chart drawn straight into a
+    # panel-sized frame; ts must be ascending. Each series is first reduced to
+    # about two points per pixel column, so cost follows the panel width.
+    ts = to_epoch(ts)
+    if last_n_hours is not None and len(ts):
+        first = int(np.searchsorted(ts, ts[-1] - int(last_n_hours * 3600)))
+        ts, moist, temp = ts[first:], moist[first:], temp[first:]
+    moist = np.asarray(moist, dtype=np.float64)
+    temp = np.asarray(temp, dtype=np.float64)
+
+    frame = FrameBuffer(width, height, BACKGROUND)
+    axes = chart_axes(ts, moist, temp, width, height, scaled, extent)
+    draw_axes(frame, axes, title or chart_title(last_n_hours), scaled, font_path)
+    if len(ts) == 0:
+        font = get_font(font_path, TITLE_FONT_SIZE)
+        x, y, w, h = axes.box
+        frame.text((x + (w - text_width(font_path, TITLE_FONT_SIZE, "No data")) / 2, y + h // 2 - 5),
+                   "No data", font, LABEL_COLOR)
+        return frame
+    # Axes follow the raw readings; smoothing only changes the drawn lines
+    curve = smoothing > 0
+    if smoothing:
+        moist, temp = smooth(moist, smoothing), smooth(temp, smoothing)
+    for values, value_range, color in ((moist, axes.left, MOIST_COLOR), (temp, axes.right, TEMP_COLOR)):
+        if decimation:
+            keep = decimate_indices(ts, values, axes.box[2], decimation, axes.t0, axes.t1)
+            draw_series(frame, axes, ts[keep], values[keep], value_range, color, curve=curve)
+        else:
+            draw_series(frame, axes, ts, values, value_range, color, curve=curve)
+    return frame
+
+
+def render_history(store, hours=None, width=240, height=135, scaled=True, smoothing=0,
+                   font_path=DEFAULT_FONT):
+    # Chart the last `hours` of a SeriesStore. Long views come from the
+    # coarsest rollup that still gives every pixel column a bucket, drawn as
+    # bucket means with the axes spanning the raw minima and maxima.
+    ts = store.ts
+    end = int(ts[-1]) + 1 if len(ts) else 0
+    start = end - int(hours * 3600) if hours else (int(ts[0]) if len(ts) else 0)
+    level = None
+    if store.rollups is not None and len(ts):
+        level = store.rollups.select(start, end, plot_box(width, height)[2])
+    # Axis extents from the range index rather than a scan of the window
+    stats = store.stats(start, end)
+    extent = None
+    if stats["moist"].count:
+        extent = (stats["moist"].min, stats["moist"].max, stats["temp"].min, stats["temp"].max)
+    if level is None:
+        window = store.window(start, end)
+        return render_chart(window.ts, window.moist, window.temp, width, height, scaled,
+                            smoothing=smoothing, font_path=font_path, extent=extent, title=chart_title(hours))
+    buckets = level.window(start, end)
+    return render_chart(buckets["ts"] + level.seconds // 2, mean(buckets, "moist"), mean(buckets, "temp"),
+                        width, height, scaled, smoothing=smoothing, font_path=font_path,
+                        extent=extent, title=chart_title(hours))
+
+
+class ChartCache:
+    """Rendered history charts of one store, reused until new data arrives.
+
+    Keyed by (store version, hours, scaled, smoothing, panel size) and bounded
+    to `capacity` frames with least-recently-used eviction. Frames are shared
+    between callers, so treat them as read-only.
+    """
+
+    def __init__(self, store, capacity=8):
+        self.store = store
+        self.capacity = capacity
+        self._frames = OrderedDict()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, hours=None, width=240, height=135, scaled=True, smoothing=0):
+        # Pick up readings appended by another process, e.g. the ingest service
+        self.store.refresh()
+        version = self.store.version
+        if version != self._version:
+            # Versions only grow, so older charts can never be asked for again
+            self._frames.clear()
+            self._version = version
+        key = (version, hours, scaled, smoothing, (width, height))
+        frame = self._frames.get(key)
+        if frame is not None:
+            self._frames.move_to_end(key)
+            self.hits += 1
+            return frame
+        self.misses += 1
+        frame = render_history(self.store, hours, width, height, scaled, smoothing)
+        self._frames[key] = frame
+        if len(self._frames) > self.capacity:
+            self._frames.popitem(last=False)
+        return frame
+
+
+# A strip chart keeps its axes until the data leaves them or would fit in
+# this share of the current range
+RESCALE_SHRINK = 0.5
+
+
+def _rescale(new, current):
+    (lo, hi), (cur_lo, cur_hi) = new, current
+    return lo < cur_lo or hi > cur_hi or hi - lo < RESCALE_SHRINK * (cur_hi - cur_lo)
+
+
+def _snap(value_range, upper=None):
+    # Widen a range out to whole tick steps so small drifts keep fitting
+    lo, hi = value_range
+    step = nice_step(lo, hi) / 2
+    lo, hi = max(math.floor(lo / step) * step, 0), math.ceil(hi / step) * step
+    return float(lo), float(min(hi, upper) if upper is not None else hi)
+
+
+class StripChart:
+    """Live trend view that keeps its rendered plot area between samples.
+
+    New samples shift the plot left by the whole pixel columns that elapsed and
+    only the new columns are drawn. On panels that scroll along x (the 1.14",
+    1.3" and 1.54" LCDs) the plot columns become the hardware scroll region,
+    so a shift costs one column strip over SPI. Panels without x scrolling
+    (LCD_2inch, headless, the emulator) resend the whole plot region, every
+    column at full panel height, on each shift.
+
+    Axes are redrawn only when the autoscaled ranges no longer hold the data
+    or have shrunk noticeably. Time labels would slide with the data, so hour
+    ticks are drawn under the plot instead.
+    """
+
+    def __init__(self, display, span=12 * 3600, scaled=True, font_path=DEFAULT_FONT):
+        self.display = display
+        self.span = span
+        self.scaled = scaled
+        self.font_path = font_path
+        width, height = display.disp.width, display.disp.height
+        self.frame = FrameBuffer(width, height, BACKGROUND)
+        self.box = plot_box(width, height)
+        self.step = span / (self.box[2] - 1)  # seconds per pixel column
+        self.tick = 3600 * max(1, round(span / 3600 / 6))  # seconds between hour ticks
+        self.samples = deque()  # (t, moist, temp), oldest first
+        self.axes = None
+        self.redraws = 0
+        self.columns = 0
+        # Column scrolling needs a panel whose scroll axis is x
+        self._scroll = display.scroll_axis == "x"
+        self._region_set = False
+
+    def _arrays(self):
+        t, moist, temp = zip(*self.samples)
+        return np.array(t, dtype=np.float64), np.array(moist), np.array(temp)
+
+    def _ranges(self, t0):
+        t, moist, temp = self._arrays()
+        keep = t >= t0
+        if not keep.any():
+            keep[-1] = True
+        axes = chart_axes(t[keep], moist[keep], temp[keep], self.frame.width, self.frame.height, self.scaled)
+        return axes.left, axes.right
+
+    def _draw_series(self, clip):
+        # Draw every segment crossing the clip columns, starting from the last
+        # sample left of them so the line stays connected
+        t, moist, temp = self._arrays()
+        first = max(int(np.searchsorted(t, self.axes.t0 + (clip[0] - self.box[0]) * self.step)) - 1, 0)
+        draw_series(self.frame, self.axes, t[first:], moist[first:], self.axes.left, MOIST_COLOR, clip=clip)
+        draw_series(self.frame, self.axes, t[first:], temp[first:], self.axes.right, TEMP_COLOR, clip=clip)
+
+    def _draw_background(self, x0, x1):
+        # Plot area background, grid rows, border and hour ticks for columns [x0, x1)
+        x, y, w, h = self.box
+        self.frame.fill_rect(x0, 0, x1 - x0, self.frame.height, BACKGROUND)
+        for value in nice_ticks(*self.axes.left):
+            _, py = to_pixels(self.axes, [self.axes.t0], [value], self.axes.left)
+            self.frame.fill_rect(x0, int(round(py[0])), x1 - x0, 1, GRID_COLOR)
+        self.frame.fill_rect(x0, y - 1, x1 - x0, 1, GRID_COLOR)
+        self.frame.fill_rect(x0, y + h, x1 - x0, 1, GRID_COLOR)
+        t0 = self.axes.t0 + (x0 - x) * self.step
+        t1 = self.axes.t0 + (x1 - x) * self.step
+        for t in np.arange(math.ceil(t0 / self.tick) * self.tick, t1, self.tick):
+            px, _ = to_pixels(self.axes, [t], [0], self.axes.left)
+            column = int(round(px[0]))
+            if x0 <= column < x1:
+                self.frame.fill_rect(column, y + h + 1, 1, 3, GRID_COLOR)
+
+    def _redraw(self):
+        x, y, w, h = self.box
+        draw_axes(self.frame, self.axes, scaled=self.scaled, font_path=self.font_path, time_labels=False)
+        font = get_font(self.font_path, TICK_FONT_SIZE)
+        self.frame.text((2, y + h + 3), f"-{self.span / 3600:g}h", font, LABEL_COLOR)
+        self.frame.text((x + w + 2, y + h + 3), "now", font, LABEL_COLOR)
+        self._draw_background(x, x + w)
+        self._draw_series((x, y, w, h))
+        if self._scroll and not self._region_set:
+            self.display.set_scroll_region(x, w)
+            self._region_set = True
+        self.display.show_frame(self.frame)
+        self.redraws += 1
+
+    def _shift(self, columns):
+        # Move the plot columns left, then draw and send only the new ones
+        x, y, w, h = self.box
+        columns = min(columns, w)
+        region = self.frame.buf[:, x:x + w]
+        region[:, :w - columns] = region[:, columns:].copy()
+        self._draw_background(x + w - columns, x + w)
+        self._draw_series((x + w - columns, y, columns, h))
+        strip = self.frame.buf[:, x + w - columns:x + w]
+        if self._scroll:
+            self.display.scroll(strip)
+        else:
+            self.display.show_window(x, 0, region.copy())
+        self.columns += columns
+
+    def _touch_up(self):
+        # Newest sample landed in the current last column: resend from the
+        # previous sample's column to the right edge
+        x, y, w, h = self.box
+        if len(self.samples) > 1:
+            px, _ = to_pixels(self.axes, [self.samples[-2][0]], [0], self.axes.left)
+            x0 = min(max(int(px[0]), x), x + w - 1)
+        else:
+            x0 = x + w - 1
+        self._draw_series((x0, y, x + w - x0, h))
+        self.display.show_window(x0, y, self.frame.buf[y:y + h, x0:x + w].copy())
+
+    def append(self, t, moist, temp):
+        t = float(to_epoch([t])[0]) if not isinstance(t, (int, float)) else float(t)
+        self.samples.append((t, float(moist), float(temp)))
+        if self.axes is None:
+            t1 = t
+        else:
+            t1 = self.axes.t1 + max(int((t - self.axes.t1) // self.step), 0) * self.step
+        t0 = t1 - self.span
+        # One sample left of the window keeps the first segment drawn
+        while len(self.samples) > 2 and self.samples[1][0] < t0:
+            self.samples.popleft()
+
+        left, right = self._ranges(t0)
+        if self.axes is None or _rescale(left, self.axes.left) or _rescale(right, self.axes.right):
+            left = _snap(left, 100 if self.scaled else None)
+            right = _snap(right) if self.scaled else left
+            self.axes = ChartAxes(self.box, t0, t1, left, right)
+            self._redraw()
+            return
+        columns = int(round((t1 - self.axes.t1) / self.step))
+        self.axes = self.axes._replace(t0=t0, t1=t1)
+        if columns:
+            self._shift(columns)
+        else:
+            self._touch_up()
@@ -0,0 +1,71 @@
+import numpy as np
+
+# Reduce a time-ordered series to what a chart `columns` pixels wide can show.
+# Both modes return indices into the input, in time order, so any number of
+# aligned columns can be picked with the same result.
+DECIMATION_MODES = ("minmax", "lttb")
+
+
+def _first_per_group(hits, group):
+    # Index of the first True in each group (every group has one)
+    idx = np.flatnonzero(hits)
+    g = group[idx]
+    return idx[np.r_[True, g[1:] != g[:-1]]]
+
+
+def minmax_indices(t, v, columns, t0=None, t1=None):
+    # First, last, lowest and highest sample of every pixel column (M4), so
+    # every column keeps its vertical extent and its joins to the neighbours.
+    # t is sorted, so columns are contiguous runs and reduceat finds them in O(n).
+    t = np.asarray(t, dtype=np.float64)
+    v = np.asarray(v)
+    n = len(t)
+    if n <= 2 * columns:
+        return np.arange(n)
+    t0 = t[0] if t0 is None else t0
+    t1 = t[-1] if t1 is None else t1
+    # Same pixel column the chart maps each sample to
+    col = np.clip(np.rint((t - t0) * (columns - 1) / max(t1 - t0, 1e-9)), 0, columns - 1).astype(np.intp)
+    starts = np.flatnonzero(np.r_[True, col[1:] != col[:-1]])
+    group = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, n]))
+    lows = _first_per_group(v == np.minimum.reduceat(v, starts)[group], group)
+    highs = _first_per_group(v == np.maximum.reduceat(v, starts)[group], group)
+    ends = np.r_[starts[1:] - 1, n - 1]
+    return np.unique(np.concatenate((starts, ends, lows, highs)))
+
+
+def lttb_indices(t, v, threshold):
+    # Largest-Triangle-Three-Buckets: per bucket, keep the point forming the
+    # largest triangle with the last kept point and the next bucket's average
+    t = np.asarray(t, dtype=np.float64)
+    v = np.asarray(v, dtype=np.float64)
+    n = len(t)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    # Next-bucket averages for every bucket in one go
+    sums_t = np.add.reduceat(t[1:n - 1], edges[:-1] - 1)
+    sums_v = np.add.reduceat(v[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_t = np.r_[sums_t / counts, t[-1]]
+    avg_v = np.r_[sums_v / counts, v[-1]]
+
+    out = np.empty(threshold, dtype=np.intp)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((t[a] - avg_t[i + 1]) * (v[lo:hi] - v[a])
+                      - (t[a] - t[lo:hi]) * (avg_v[i + 1] - v[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def decimate_indices(t, v, columns, mode="minmax", t0=None, t1=None):
+    if mode == "minmax":
+        return minmax_indices(t, v, columns, t0, t1)
+    if mode == "lttb":
+        # Two points per column, like minmax
+        return lttb_indices(t, v, 2 * columns)
+    raise ValueError(f"Unknown decimation mode {mode!r}, expected one of {DECIMATION_MODES}.")
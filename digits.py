@@ -0,0 +1,92 @@
+import math
+
+import numpy as np
+
+from framebuffer import RGB565, FrameBuffer, rgb565
+
+# Characters pre-rasterized for value readouts; anything else is added on first use
+DIGIT_CHARS = "0123456789.,:-+% °CFhms"
+
+
+class DigitCells:
+    """RGB565 tiles of the characters a numeric readout needs, in one font.
+
+    Digits share one cell width (the widest digit), so a value that changes
+    from 19.8 to 20.1 keeps every other cell in place and only the changed
+    cells have to be redrawn.
+    """
+
+    def __init__(self, font, fg="WHITE", bg=(39, 39, 39), chars=DIGIT_CHARS):
+        self.font = font
+        self.fg = fg
+        self.bg = rgb565(bg)
+        ascent, descent = font.getmetrics()
+        self.height = ascent + descent
+        self.digit_width = max(math.ceil(font.getlength(d)) for d in "0123456789")
+        self.tiles = {}
+        for ch in chars:
+            self.tile(ch)
+
+    def width(self, ch):
+        return self.tile(ch).shape[1]
+
+    def tile(self, ch):
+        tile = self.tiles.get(ch)
+        if tile is None:
+            advance = math.ceil(self.font.getlength(ch))
+            w = self.digit_width if ch.isdigit() else max(1, advance)
+            cell = FrameBuffer(w, self.height, self.bg)
+            cell.text(((w - advance) // 2, 0), ch, self.font, self.fg)
+            tile = self.tiles[ch] = cell.buf
+        return tile
+
+
+class NumericField:
+    """A fixed spot on the panel showing a short value such as 23.5°C.
+
+    update() compares the new text with what is on screen cell by cell and
+    sends a single window spanning only the cells that differ.
+    """
+
+    def __init__(self, display, x, y, cells, template="00.0°C"):
+        self.display = display
+        self.x = x
+        self.y = y
+        self.cells = cells
+        self.width = sum(cells.width(ch) for ch in template)
+        self._shown = []  # (char, x offset) per cell currently on the panel
+        self._extent = 0
+
+    def _layout(self, text):
+        out, offset = [], 0
+        for ch in text:
+            out.append((ch, offset))
+            offset += self.cells.width(ch)
+        return out, offset
+
+    def update(self, value, fmt="{}"):
+        text = fmt.format(value) if not isinstance(value, str) else value
+        cells, extent = self._layout(text)
+        if cells == self._shown:
+            return 0
+
+        # Pixel span covering every cell that differs, old or new
+        old = set(self._shown)
+        new = set(cells)
+        changed = [(ch, offset) for ch, offset in cells if (ch, offset) not in old]
+        cleared = [(ch, offset) for ch, offset in self._shown if (ch, offset) not in new]
+        start = min(offset for _, offset in changed + cleared)
+        end = max([offset + self.cells.width(ch) for ch, offset in changed + cleared])
+
+        # Redraw that span in one window, background first so shorter values
+        # also clear what was there before
+        strip = np.full((self.cells.height, end - start), self.cells.bg, dtype=RGB565)
+        for ch, offset in cells:
+            w = self.cells.width(ch)
+            if offset + w > start and offset < end:
+                lo, hi = max(offset, start), min(offset + w, end)
+                strip[:, lo - start:hi - start] = self.cells.tile(ch)[:, lo - offset:hi - offset]
+        self.display.show_window(self.x + start, self.y, strip)
+
+        self._shown, self._extent = cells, extent
+        return strip.nbytes
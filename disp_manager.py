@@ -2,7 +2,19 @@ import os
 import time
 import logging
 import platform
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image, ImageDraw, ImageFont
+from framebuffer import FrameBuffer, frame_hash
+from emoji_atlas import EmojiAtlas
+from asset_cache import AssetCache
+from digits import DigitCells, NumericField
+from text_layout import draw_layout, layout_text
+from templates import MOISTURE_SCREEN, RenderPlan
+from transitions import transition_frames
+from playback import Player
+from frameseq import FrameSequence
 
 # Get the directory of the current script (disp_manager.py)
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -23,11 +35,27 @@ logging.basicConfig(level=logging.DEBUG)
 
 WAIT_SECONDS = 2
 
+# Set DISPLAY_BACKEND=headless to render into memory, or DISPLAY_BACKEND=emulator
+# to stream frames to a running `python emulator.py` browser viewer
+DISPLAY_BACKEND = os.environ.get("DISPLAY_BACKEND", "")
+
 
 class Display:
-    def __init__(self):
+    def __init__(self, disp=None):
         # Raspberry Pi pin configuration:
-        if IS_LINUX:
+        if disp is not None:
+            logging.info("Using provided display backend.")
+            self.disp = disp
+        elif DISPLAY_BACKEND == "headless":
+            logging.info("Rendering to headless in-memory display.")
+            from headless import HeadlessDisplay
+            self.disp = HeadlessDisplay()
+        elif DISPLAY_BACKEND == "emulator":
+            logging.info("Streaming frames to the emulator.")
+            from emulator import EmulatorLCD
+            self.disp = EmulatorLCD()
+            self.disp.Init()
+        elif IS_LINUX:
             self.RST = 27
             self.DC = 25
             self.BL = 18
@@ -43,17 +71,262 @@ class Display:
             logging.info("Simulating LCD display on Windows.")
             self.disp = self.MockDisplay()
 
+        # RGB565 shadow of what is currently on the panel
+        self.fb = FrameBuffer(self.disp.width, self.disp.height)
+
+        # Hash of the last transmitted frame, used to skip identical refreshes.
+        # Windowed writes clear it; it is then recomputed from the shadow frame,
+        # which stays valid once a full frame has gone out.
+        self._last_hash = None
+        self._shadow_valid = False
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.windows_sent = 0
+
+        # Digit tiles per (font, colours), shared by numeric fields
+        self._digit_cells = {}
+
+        # Screen templates compiled to render plans, by template
+        self._plans = {}
+
+        # Hardware scroll state: the region along the scroll axis that moves and
+        # how far its content has been rotated in panel memory
+        self.scroll_axis = getattr(self.disp, "SCROLL_AXIS", "y")
+        self._scroll_region = None
+        self._scroll_pos = 0
+
         # Initialize fonts
         self.load_fonts()
 
+        # Colour emoji / status icons, rasterized once and blitted by codepoint
+        self.emoji = EmojiAtlas(cell=22)
+
+        # Pictures pre-converted to this panel's RGB565, memory-mapped on use
+        self.assets = AssetCache(self.disp.width, self.disp.height, panel=type(self.disp).__name__)
+
     def load_fonts(self):
-        self.Font1 = ImageFont.truetype(os.path.join(current_dir, 'Font', 'Font00.ttf'), 30)
-        self.Font2 = ImageFont.truetype(os.path.join(current_dir, 'Font', 'Font01.ttf'), 25)
-        self.Font3 = ImageFont.truetype(os.path.join(current_dir, 'Font', 'Font02.ttf'), 25)
-        self.Font4 = ImageFont.truetype(os.path.join(current_dir, 'Font', 'Font03.ttf'), 20)
-        self.Font5 = ImageFont.truetype(os.path.join(current_dir, 'Font', 'Font04.ttf'), 22)
-        self.Font6 = ImageFont.truetype(os.path.join(current_dir, 'Font', 'OrbitronM.ttf'), 22)
-        self.Font7 = ImageFont.truetype(os.path.join(current_dir, 'Font', 'OrbitronSB.ttf'), 18)
+        self.Font1 = self.load_font('Font00.ttf', 30)
+        self.Font2 = self.load_font('Font01.ttf', 25)
+        self.Font3 = self.load_font('Font02.ttf', 25)
+        self.Font4 = self.load_font('Font03.ttf', 20)
+        self.Font5 = self.load_font('Font04.ttf', 22)
+        self.Font6 = self.load_font('OrbitronM.ttf', 22)
+        self.Font7 = self.load_font('OrbitronSB.ttf', 18)
+
+    def load_font(self, name, size):
+        try:
+            return ImageFont.truetype(os.path.join(current_dir, 'Font', name), size)
+        except IOError:
+            # Keep headless and CI runs going when a font file is not checked out
+            logging.warning(f"Font {name} not found, using default font.")
+            return ImageFont.load_default()
+
+    def new_frame(self, color=(39, 39, 39)):
+        return FrameBuffer(self.disp.width, self.disp.height, color)
+
+    def show_frame(self, frame=None, force=False):
+        # Frames are already RGB565, so the driver sends them without conversion
+        if frame is None:
+            frame = self.fb
+        buf = frame.buf if isinstance(frame, FrameBuffer) else frame
+        if buf.shape != self.fb.buf.shape:
+            raise ValueError('Frame must be same dimensions as display ({0}x{1}).'
+                             .format(self.disp.width, self.disp.height))
+
+        # Skip the SPI transfer when the panel already shows this exact frame
+        digest = frame_hash(buf)
+        if self._last_hash is None and self._shadow_valid:
+            self._last_hash = frame_hash(self.fb.buf)
+        if not force and digest == self._last_hash:
+            self.frames_skipped += 1
+            return False
+
+        # Full frames are written unrotated, so undo any hardware scroll first
+        if self._scroll_pos:
+            self._set_scroll_start(0)
+
+        self.disp.ShowBuffer(buf)
+        if buf is not self.fb.buf:
+            self.fb.buf[:] = buf
+        self._last_hash = digest
+        self._shadow_valid = True
+        self.frames_sent += 1
+        return True
+
+    def play_frames(self, frames, fps=30):
+        # Send a batch of frames on a fixed clock. When SPI can't keep up,
+        # frames whose slot has already passed are dropped; the last always shows.
+        interval = 1.0 / fps
+        start = time.monotonic()
+        shown = dropped = 0
+        for k, frame in enumerate(frames):
+            due = start + k * interval
+            now = time.monotonic()
+            if now > due + interval and k < len(frames) - 1:
+                dropped += 1
+                continue
+            if due > now:
+                time.sleep(due - now)
+            self.show_frame(frame)
+            shown += 1
+        return {"frames": len(frames), "shown": shown, "dropped": dropped,
+                "seconds": time.monotonic() - start}
+
+    def transition(self, frame, kind="crossfade", duration=0.4, fps=30, **options):
+        # All intermediate frames are computed in one NumPy batch up front
+        frame = frame.buf if isinstance(frame, FrameBuffer) else frame
+        frames = transition_frames(kind, self.fb.buf.copy(), frame, round(duration * fps), **options)
+        return self.play_frames(frames, fps)
+
+    def play(self, source, **options):
+        # Animated GIF / APNG / MJPEG through the decode-ahead player
+        return Player(self, source, **options).play()
+
+    def play_sequence(self, path, fps=None, loops=1):
+        # Pre-encoded .seq file: mapped windows go straight to the driver
+        seq = FrameSequence(path)
+        try:
+            if (seq.width, seq.height) != (self.disp.width, self.disp.height):
+                raise ValueError(f"Sequence is {seq.width}x{seq.height}, display is "
+                                 f"{self.disp.width}x{self.disp.height}.")
+            return seq.play(self, fps=fps, loops=loops)
+        finally:
+            seq.close()
+
+    def show_window(self, x, y, buf):
+        # Write one rectangle of the panel and keep the shadow frame in step
+        buf = buf.buf if isinstance(buf, FrameBuffer) else buf
+        h, w = buf.shape
+        if x < 0 or y < 0 or x + w > self.disp.width or y + h > self.disp.height:
+            raise ValueError(f"Window {w}x{h} at ({x}, {y}) does not fit the display.")
+        self.fb.blit(buf, x, y)
+        self._last_hash = None
+        if not self._shadow_valid or not self._send_window(buf, x, y):
+            # An unknown panel needs a full frame first, as does a window
+            # straddling the edge of a scrolled region
+            self.show_frame(force=True)
+            return
+        self.windows_sent += 1
+
+    def _send_window(self, buf, x, y):
+        # Scrolled panel memory is rotated along the scroll axis, so a window
+        # inside the region lands at its rotated position, split at the wrap
+        if not self._scroll_pos:
+            self.disp.ShowBuffer(buf, x, y)
+            return True
+        start, length = self._scroll_region
+        pos, size = (x, buf.shape[1]) if self.scroll_axis == "x" else (y, buf.shape[0])
+        if pos + size <= start or pos >= start + length:
+            self.disp.ShowBuffer(buf, x, y)
+            return True
+        if pos < start or pos + size > start + length:
+            return False
+        mem = (pos - start + self._scroll_pos) % length
+        head = min(size, length - mem)
+        for offset, count, at in ((0, head, start + mem), (head, size - head, start)):
+            if count <= 0:
+                continue
+            if self.scroll_axis == "x":
+                self.disp.ShowBuffer(buf[:, offset:offset + count], at, y)
+            else:
+                self.disp.ShowBuffer(buf[offset:offset + count], x, at)
+        return True
+
+    def invalidate(self):
+        # Forget the last frame hash, e.g. after something else drew on the panel
+        self._last_hash = None
+        self._shadow_valid = False
+
+    def plan(self, screen):
+        # Compile a screen template once and reuse the plan
+        plan = self._plans.get(id(screen))
+        if plan is None:
+            plan = self._plans[id(screen)] = RenderPlan(screen, self.emoji)
+        return plan
+
+    def numeric_field(self, x, y, template="00.0°C", font=None, fg="WHITE", bg=(39, 39, 39)):
+        # A value display that redraws only the character cells that change
+        font = font or self.Font6
+        key = (id(font), fg, bg)
+        if key not in self._digit_cells:
+            self._digit_cells[key] = DigitCells(font, fg, bg)
+        return NumericField(self, x, y, self._digit_cells[key], template)
+
+    def _hardware_scroll(self):
+        return hasattr(self.disp, "SetScrollStart") and hasattr(self.disp, "SCROLL_AXIS")
+
+    def _axis_length(self):
+        return self.disp.width if self.scroll_axis == "x" else self.disp.height
+
+    def _set_scroll_start(self, pos):
+        start, length = self._scroll_region
+        self._scroll_pos = pos % length
+        if self._hardware_scroll():
+            self.disp.SetScrollStart(self.disp.SCROLL_OFFSET + start + self._scroll_pos)
+
+    def set_scroll_region(self, start=0, length=None):
+        # Lines [start, start + length) along scroll_axis move; the rest stay fixed.
+        # On landscape ST7789 panels the axis is x, which suits tickers and strip charts.
+        if length is None:
+            length = self._axis_length() - start
+        self._scroll_region = (start, length)
+        self._scroll_pos = 0
+        if self._hardware_scroll():
+            top = self.disp.SCROLL_OFFSET + start
+            self.disp.SetScrollArea(top, length, self.disp.SCROLL_LINES - top - length)
+            self.disp.SetScrollStart(top)
+
+    def scroll(self, strip):
+        # Shift the scroll region by the strip's depth towards its start (up, or left
+        # when scroll_axis is "x") and show the strip in the newly exposed lines.
+        # With hardware scrolling only the strip and the start register go over SPI.
+        if self._scroll_region is None:
+            self.set_scroll_region()
+        start, length = self._scroll_region
+        strip = strip.buf if isinstance(strip, FrameBuffer) else strip
+        step = strip.shape[1] if self.scroll_axis == "x" else strip.shape[0]
+        if step <= 0:
+            return
+        if step > length:
+            raise ValueError(f"Cannot scroll {step} lines in a {length} line region.")
+
+        # Keep the shadow frame in logical (on-screen) order
+        if self.scroll_axis == "x":
+            region = self.fb.buf[:, start:start + length]
+            region[:, :length - step] = region[:, step:].copy()
+            region[:, length - step:] = strip
+        else:
+            region = self.fb.buf[start:start + length]
+            region[:length - step] = region[step:].copy()
+            region[length - step:] = strip
+        self._last_hash = None
+
+        if not self._hardware_scroll():
+            # No scroll registers: resend just the scroll region
+            if self.scroll_axis == "x":
+                self.disp.ShowBuffer(region, start, 0)
+            else:
+                self.disp.ShowBuffer(region, 0, start)
+            return
+
+        # The lines leaving the screen are the memory lines that now wrap round to
+        # the end of the region, so the strip goes there (in up to two windows)
+        first = self._scroll_pos
+        head = min(step, length - first)
+        for offset, count, mem in ((0, head, first), (head, step - head, 0)):
+            if count <= 0:
+                continue
+            if self.scroll_axis == "x":
+                self.disp.ShowBuffer(strip[:, offset:offset + count], start + mem, 0)
+            else:
+                self.disp.ShowBuffer(strip[offset:offset + count], 0, start + mem)
+        self._set_scroll_start(self._scroll_pos + step)
+
+    def show_image(self, image, policy="letterbox"):
+        # Optional PIL input path; pictures of any size are fitted to the panel
+        if image.size != (self.disp.width, self.disp.height):
+            return self.show_frame(self.assets.render(image, policy))
+        return self.show_frame(FrameBuffer.from_image(image))
 
     def draw_test(self):
         image = Image.new("RGB", (self.disp.width, self.disp.height), "WHITE")
@@ -68,16 +341,17 @@ class Display:
         draw.rectangle([(20, 1), (50, 31)], fill="WHITE", outline="BLUE")
         draw.arc((90, 1, 122, 33), 0, 360, fill=(0, 255, 0))
 
-        draw.text((1, 45), u'Test1 ✔️', font=self.Font2, fill="BLACK")
-        draw.text((90, 82), u'Test2 🎉🎉', font=self.Font2, fill="RED")
-        draw.text((0, 85), u'Test3 🤗⛱️', font=self.Font3, fill="BLUE")
+        # Text goes into the framebuffer so emoji come from the atlas
+        frame = FrameBuffer.from_image(image)
+        frame.text((1, 45), u'Test1 ✔️', self.Font2, "BLACK", self.emoji)
+        frame.text((90, 82), u'Test2 🎉🎉', self.Font2, "RED", self.emoji)
+        frame.text((0, 85), u'Test3 🤗⛱️', self.Font3, "BLUE", self.emoji)
 
-        self.disp.ShowImage(image)
+        self.show_frame(frame)
 
     def image_test(self):
         logging.info("Displaying image.")
-        image = Image.open('./pic/LCD_1inch14.jpg')
-        self.disp.ShowImage(image)
+        self.show_frame(self.assets.get(os.path.join(current_dir, 'pic', 'LCD_1inch14.jpg')))
 
     def bright_test(self):
         for x in range(0, 100):
@@ -117,6 +391,9 @@ class Display:
         def ShowImage(self, image):
             image.show()  # Show the image on the screen using PIL's viewer (Windows)
 
+        def ShowBuffer(self, buf, Xstart=0, Ystart=0):
+            self.ShowImage(FrameBuffer.from_array(buf).to_image())
+
         def bl_DutyCycle(self, duty):
             logging.info(f"Mock backlight set to {duty}%.")
 
@@ -124,85 +401,61 @@ class Display:
             logging.info("Mock display exiting.")
 
     def show_text(self, content: str, font_size=None, color="WHITE"):
-        # Use default font size if none is provided
+        self.show_frame(self.render_text(content, font_size, color))
+
+    def render_text(self, content: str, font_size=None, color="WHITE"):
+        # Use default font size if none is provided; it is the largest size tried
         if font_size is None:
             font_size = 22  # Default font size
 
-        # Create a new image for drawing the text
-        image = Image.new("RGB", (self.disp.width, self.disp.height), (39, 39, 39, 39))
-        draw = ImageDraw.Draw(image)
-
-        # Load the font with the specified size
-        try:
-            font = ImageFont.truetype(os.path.join(current_dir, 'Font', 'OrbitronM.ttf'), font_size)
-        except IOError:
-            font = ImageFont.load_default()  # Fallback if specified font is not available
+        # Create a new frame for drawing the text
+        frame = self.new_frame((39, 39, 39))
 
-        # Calculate text size and position
-        bbox = draw.textbbox((0, 0), content, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        x = (self.disp.width - text_width) / 2
-        y = (self.disp.height - text_height) / 2
+        # Wrap and shrink the text to fit the screen; layouts are memoized, so
+        # repeating a message costs no measuring at all
+        box = (5, 5, self.disp.width - 10, self.disp.height - 10)
+        layout = layout_text(content, box, os.path.join(current_dir, 'Font', 'OrbitronM.ttf'), max_size=font_size,
+                             atlas=self.emoji)
 
         # Draw the text centered
-        draw.text((x, y), content, font=font, fill=color)
-        self.disp.ShowImage(image)
+        draw_layout(frame, layout, color, self.emoji)
+        return frame
 
     def draw_moisture_bar(self, current_level):
+        self.show_frame(self.render_moisture_bar(current_level))
+
+    def render_moisture_bar(self, current_level):
         # Define margins
         top_margin = 10
-        bottom_margin = 10
 
         # Set up dimensions and positions for the bar
         bar_width = 20
-        bar_height = 200
-        image_width = self.disp.width
-        image_height = bar_height + top_margin + bottom_margin
-        bar_x = (image_width - bar_width) // 2  # Center horizontally
+        bar_height = self.disp.height - 2 * top_margin  # Fill the panel height
+        bar_x = (self.disp.width - bar_width) // 2  # Center horizontally
         bar_y = top_margin  # Start position vertically with top margin
 
-        # Create a new blank image with adjusted height
-        image = Image.new("RGBA", (image_width, image_height), (255, 255, 255, 255))  # Use RGBA for transparency
-        draw = ImageDraw.Draw(image)
+        frame = self.new_frame("WHITE")
 
-        # Draw the background of the moisture bar with a gradient from light brown to light blue
-        self.draw_gradient(draw, bar_x, bar_y, bar_x + bar_width, bar_y + bar_height,
-                           start_color=(22, 98, 125),
-                           end_color=(125, 140, 139))  # Light brown to light blue
+        # Background of the moisture bar, a gradient from blue to grey-green
+        frame.bar(bar_x, bar_y, bar_width + 1, bar_height, (22, 98, 125), (125, 140, 139))
 
-        # Optimal range (20% - 40%) with green lines
+        # Optimal range (20% - 40%) with white lines
         good_top = bar_y + (100 - 40) * bar_height // 100
         good_bot = bar_y + (100 - 20) * bar_height // 100
-        draw.line([bar_x - 5, good_top, bar_x + bar_width + 5, good_top], fill="WHITE", width=1)
-        draw.line([bar_x - 5, good_bot, bar_x + bar_width + 5, good_bot], fill="WHITE", width=1)
+        frame.line(bar_x - 5, good_top, bar_x + bar_width + 5, good_top, "WHITE")
+        frame.line(bar_x - 5, good_bot, bar_x + bar_width + 5, good_bot, "WHITE")
 
-        # Draw the current level as a white dash
+        # Draw the current level as a dash
         current_level_y = bar_y + (100 - current_level) * bar_height // 100
-        draw.line([bar_x - 5, current_level_y, bar_x + bar_width + 5, current_level_y], fill=(169, 191, 4), width=3)
-
-        # Show the image
-        self.disp.ShowImage(image.convert("RGB"))  # Convert to RGB before showing on display
-
-    def draw_gradient(self, draw, x1, y1, x2, y2, start_color, end_color):
-        # Calculate the height of the gradient
-        height = y2 - y1
-
-        # Draw the gradient by filling rectangles with varying colors
-        for i in range(height):
-            # Calculate the color for this position
-            r = int(start_color[0] + (end_color[0] - start_color[0]) * i / height)
-            g = int(start_color[1] + (end_color[1] - start_color[1]) * i / height)
-            b = int(start_color[2] + (end_color[2] - start_color[2]) * i / height)
-            color = (r, g, b)
-
-            # Draw a horizontal line with the calculated color
-            draw.line([(x1, y1 + i), (x2, y1 + i)], fill=color)
+        frame.line(bar_x - 5, current_level_y, bar_x + bar_width + 5, current_level_y, (169, 191, 4), width=3)
+        return frame
 
     def show_hor_bar(self, moisture_level):
-        # Create a blank image
-        image = Image.new("RGB", (self.disp.width, self.disp.height), "WHITE")
-        draw = ImageDraw.Draw(image)
+        self.show_frame(self.render_hor_bar(moisture_level))
+
+    def render_hor_bar(self, moisture_level):
+        # Create a blank frame
+        frame = self.new_frame("WHITE")
 
         # Define the size and position of the bar
         bar_width = 200
@@ -211,65 +464,109 @@ class Display:
         bar_y = (self.disp.height - bar_height) // 2
 
         # Draw the background of the bar
-        draw.rectangle([bar_x, bar_y, bar_x + bar_width, bar_y + bar_height], fill=(255, 255, 255), outline=(0, 0, 0))
+        frame.fill_rect(bar_x, bar_y, bar_width + 1, bar_height + 1, (255, 255, 255))
+        frame.rect(bar_x, bar_y, bar_width + 1, bar_height + 1, (0, 0, 0))
 
         # Draw the current moisture level on the bar
-        moisture_width = (moisture_level / 100) * bar_width
-        draw.rectangle([bar_x, bar_y, bar_x + moisture_width, bar_y + bar_height], fill=(0, 0, 255))
-
-        # Display the image
-        self.disp.ShowImage(image)
-
-    def show_on_display(self, image_path):
-        # Open the image
-        image = Image.open(image_path)
+        moisture_width = int((moisture_level / 100) * bar_width)
+        frame.fill_rect(bar_x, bar_y, moisture_width + 1, bar_height + 1, (0, 0, 255))
+        return frame
 
+    def show_on_display(self, image_path, policy="letterbox"):
         # Display it using the Display class
-        self.disp.ShowImage(image.convert("RGB"))
+        self.show_frame(self.render_picture(image_path, policy))
 
+    def render_picture(self, image_path, policy="letterbox"):
+        # Load the panel-sized RGB565 copy from the asset cache
+        return FrameBuffer.from_array(self.assets.get(image_path, policy))
 
 
 
-    def show_moisture_with_text(self, current_level, text):
-        # Create a new blank image with the screen size
-        image = Image.new("RGBA", (240, 135), (39, 39, 39, 39))
-        draw = ImageDraw.Draw(image)
-
-        # Define margins and dimensions
-        top_margin = 5
-        bottom_margin = 5
-        bar_width = 20
-        bar_height = 125
-        image_width = 240
-        image_height = 135
-
-        # Move the bar 30 pixels to the right from the center
-        bar_x = (image_width - bar_width) // 2 + 100
-        bar_y = top_margin  # Start position vertically with top margin
-
-        # Draw the background of the moisture bar with a gradient from light brown to light blue
-        self.draw_gradient(draw, bar_x, bar_y, bar_x + bar_width, bar_y + bar_height,
-                           start_color=(22, 98, 125),
-                           end_color=(125, 140, 139))  # Light brown to light blue
-
-        # Optimal range (20% - 40%) with green lines
-        good_top = bar_y + (100 - 40) * bar_height // 100
-        good_bot = bar_y + (100 - 20) * bar_height // 100
-        draw.line([bar_x - 0, good_top, bar_x + bar_width + 0, good_top], fill="WHITE", width=2)
-        draw.line([bar_x - 0, good_bot, bar_x + bar_width + 0, good_bot], fill="WHITE", width=2)
-
-        # Draw the current level as a white dash
-        current_level_y = bar_y + (100 - current_level) * bar_height // 100
-        draw.line([bar_x - 15, current_level_y, bar_x + bar_width + 0, current_level_y], fill=(169, 191, 4), width=3)
-
-        # Draw the text at the bottom of the screen
-        text_position = (10, 10)
-        draw.text(text_position, text, font=self.Font7, fill="WHITE")
-
-        # Show the image
-        self.disp.ShowImage(image.convert("RGB"))  # Convert to RGB before showing on display
-
 
+    def show_moisture_with_text(self, current_level, text):
+        self.show_frame(self.render_moisture_with_text(current_level, text))
+
+    def render_moisture_with_text(self, current_level, text):
+        # Drawn from the MOISTURE_SCREEN template: bar and range lines are baked
+        # into the plan once, only the level marker and the text are per frame
+        return self.plan(MOISTURE_SCREEN).render({"level": current_level, "text": text})
+
+
+# A carousel page: render() returns a frame for the display, shown for `duration` seconds
+Page = namedtuple("Page", "name render duration")
+
+
+class Carousel:
+    def __init__(self, display, pages=(), lead=3.0, transition=None, transition_time=0.4, fps=30):
+        self.display = display
+        self.pages = list(pages)
+        # How long before its slot a page starts rendering in the background
+        self.lead = lead
+        # Optional transition between pages ("crossfade", "slide", "wipe"),
+        # computed in the worker together with the page itself
+        self.transition = transition
+        self.transition_time = transition_time
+        self.fps = fps
+        # Monotonic time each page is next due on screen
+        self.due = {}
+        self.late = 0
+        self._stop = threading.Event()
+
+    def add(self, name, render, duration=10):
+        self.pages.append(Page(name, render, duration))
+
+    def stop(self):
+        self._stop.set()
+
+    def _prepare(self, page, previous):
+        frame = page.render()
+        buf = frame.buf if isinstance(frame, FrameBuffer) else frame
+        if self.transition is None or previous is None:
+            return buf, None
+        n = round(self.transition_time * self.fps)
+        return buf, transition_frames(self.transition, previous, buf, n)
+
+    def _sleep_until(self, deadline):
+        # Returns False if stop() was called while waiting
+        return not self._stop.wait(max(0.0, deadline - time.monotonic()))
+
+    def run(self, cycles=None):
+        # Every slot deadline is start + sum of durations, so slow renders or
+        # slow SPI never push the cadence back
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="carousel")
+        try:
+            deadline = None
+            pending = executor.submit(self._prepare, self.pages[0], None)
+            shown = 0
+            while not self._stop.is_set():
+                page = self.pages[shown % len(self.pages)]
+                frame, frames = pending.result()
+                if deadline is None:
+                    # The clock starts once the first page is ready
+                    deadline = time.monotonic()
+                if not self._sleep_until(deadline):
+                    break
+                lateness = time.monotonic() - deadline
+                if lateness > 0.1:
+                    self.late += 1
+                    logging.warning(f"Page {page.name} shown {lateness:.2f}s late.")
+                if frames is not None:
+                    self.display.play_frames(frames, self.fps)
+                else:
+                    self.display.show_frame(frame)
+                shown += 1
+                if cycles is not None and shown >= cycles * len(self.pages):
+                    break
+
+                # Pre-render the next page shortly before it is due
+                nxt = self.pages[shown % len(self.pages)]
+                deadline += page.duration
+                self.due[nxt.name] = deadline
+                if not self._sleep_until(deadline - self.lead):
+                    break
+                pending = executor.submit(self._prepare, nxt, frame)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
 
 
 # Main script execution
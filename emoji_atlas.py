@@ -0,0 +1,167 @@
+import os
+import json
+import hashlib
+import logging
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from framebuffer import SKIP_CODEPOINTS, pack_rgb565
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(current_dir, 'cache')
+
+# Colour emoji fonts to try, first match wins. EMOJI_FONT overrides the search.
+EMOJI_FONT_PATHS = [
+    os.environ.get("EMOJI_FONT", ""),
+    "/usr/share/fonts/truetype/noto/NotoColorEmoji.ttf",
+    "/usr/share/fonts/noto/NotoColorEmoji.ttf",
+    "C:\\Windows\\Fonts\\seguiemj.ttf",
+]
+
+# NotoColorEmoji only ships 109px bitmaps, so glyphs are drawn there and scaled
+EMOJI_FONT_SIZE = 109
+
+# Status icons the screens use, packed into the atlas up front
+DEFAULT_GLYPHS = "✔✅❌⚠🎉🤗⛱😊🌍💧🌡🌱☀🌧🔋⏰"
+
+ATLAS_COLUMNS = 16
+
+# Emoji fonts also carry digits and '#', so only symbols from here up are
+# looked up on demand
+LAZY_MIN_CODEPOINT = 0x2000
+
+
+class EmojiAtlas:
+    """Colour glyphs rasterized once and packed into a single atlas image.
+
+    Glyphs come from an image directory (files named by hex codepoint, e.g.
+    1f389.png) or a colour emoji font. The packed atlas is saved to CACHE_DIR,
+    so later runs just load one PNG. Each glyph is kept as an RGB565 tile plus
+    an alpha mask, ready to blend into a FrameBuffer.
+    """
+
+    def __init__(self, cell=22, glyphs=DEFAULT_GLYPHS, font_path=None, image_dir=None,
+                 cache_dir=CACHE_DIR):
+        self.cell = cell
+        self.image_dir = image_dir
+        self.font_path = font_path or next((p for p in EMOJI_FONT_PATHS if p and os.path.exists(p)), None)
+        self._font = None
+        self.tiles = {}
+        self._missing = set()
+
+        codepoints = sorted({ord(c) for c in glyphs} - SKIP_CODEPOINTS)
+        if self.font_path is None and image_dir is None:
+            logging.warning("No colour emoji font or image set found; emoji fall back to the text font.")
+            return
+
+        path = self._cache_path(cache_dir, codepoints)
+        if os.path.exists(path + ".png") and os.path.exists(path + ".json"):
+            self._load(path)
+        else:
+            self._build(codepoints)
+            self._save(path)
+
+    def __contains__(self, char):
+        return self.glyph(char) is not None
+
+    def _cache_path(self, cache_dir, codepoints):
+        # Keyed on the sources actually used: a directory's mtime doesn't
+        # change when a PNG in it is replaced, so take the newest mtime and
+        # the sizes of the glyph images themselves
+        sources = []
+        if self.image_dir is not None:
+            stats = [os.stat(path) for path in map(self._image_path, codepoints) if os.path.exists(path)]
+            sources += [max((st.st_mtime_ns for st in stats), default=0), [st.st_size for st in stats]]
+        if self.font_path is not None:
+            sources.append(os.path.getmtime(self.font_path))
+        key = json.dumps([self.cell, self.font_path, self.image_dir, sources, codepoints])
+        return os.path.join(cache_dir, "emoji_" + hashlib.sha1(key.encode()).hexdigest()[:16])
+
+    def _image_path(self, cp):
+        return os.path.join(self.image_dir, "{0:x}.png".format(cp))
+
+    def _rasterize(self, cp):
+        # One RGBA cell per codepoint, or None if no source has it
+        if self.image_dir is not None:
+            path = self._image_path(cp)
+            if os.path.exists(path):
+                return self._fit(Image.open(path).convert("RGBA"))
+        if self.font_path is None:
+            return None
+        if self._font is None:
+            self._font = ImageFont.truetype(self.font_path, EMOJI_FONT_SIZE)
+        char = chr(cp)
+        if not self._font.getmask(char).getbbox():
+            return None
+        image = Image.new("RGBA", (EMOJI_FONT_SIZE * 2, EMOJI_FONT_SIZE * 2), (0, 0, 0, 0))
+        ImageDraw.Draw(image).text((0, 0), char, font=self._font, embedded_color=True)
+        bbox = image.getbbox()
+        if bbox is None:
+            return None
+        return self._fit(image.crop(bbox))
+
+    def _fit(self, image):
+        # Scale into the cell keeping aspect, centred on a transparent square
+        image.thumbnail((self.cell, self.cell), Image.Resampling.LANCZOS)
+        cell = Image.new("RGBA", (self.cell, self.cell), (0, 0, 0, 0))
+        cell.paste(image, ((self.cell - image.width) // 2, (self.cell - image.height) // 2))
+        return cell
+
+    def _build(self, codepoints):
+        cells = {}
+        for cp in codepoints:
+            cell = self._rasterize(cp)
+            if cell is not None:
+                cells[cp] = cell
+        self.atlas = Image.new("RGBA", (ATLAS_COLUMNS * self.cell,
+                                        max(1, -(-len(cells) // ATLAS_COLUMNS)) * self.cell))
+        self.index = {}
+        for i, (cp, cell) in enumerate(cells.items()):
+            x, y = (i % ATLAS_COLUMNS) * self.cell, (i // ATLAS_COLUMNS) * self.cell
+            self.atlas.paste(cell, (x, y))
+            self.index[cp] = (x, y)
+        self._slice()
+
+    def _save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.atlas.save(path + ".png")
+        with open(path + ".json", "w") as f:
+            json.dump({"cell": self.cell, "index": {str(cp): xy for cp, xy in self.index.items()}}, f)
+
+    def _load(self, path):
+        self.atlas = Image.open(path + ".png").convert("RGBA")
+        with open(path + ".json") as f:
+            self.index = {int(cp): tuple(xy) for cp, xy in json.load(f)["index"].items()}
+        self._slice()
+
+    def _slice(self):
+        # Convert the whole atlas once; glyph tiles are views into these arrays
+        rgba = np.asarray(self.atlas)
+        self._rgb565 = pack_rgb565(rgba[..., :3])
+        self._alpha = rgba[..., 3]
+        c = self.cell
+        self.tiles = {cp: (self._rgb565[y:y + c, x:x + c], self._alpha[y:y + c, x:x + c])
+                      for cp, (x, y) in self.index.items()}
+
+    def glyph(self, char):
+        cp = ord(char)
+        tile = self.tiles.get(cp)
+        if tile is not None or cp < LAZY_MIN_CODEPOINT or cp in self._missing:
+            return tile
+        if cp in SKIP_CODEPOINTS or not (self.font_path or self.image_dir):
+            return None
+        # Rasterize unexpected symbols on first use and keep them for this run
+        cell = self._rasterize(cp)
+        if cell is None:
+            self._missing.add(cp)
+            return None
+        rgba = np.asarray(cell)
+        tile = self.tiles[cp] = (pack_rgb565(rgba[..., :3]), rgba[..., 3].copy())
+        return tile
+
+    def draw(self, fb, x, y, char):
+        tile = self.glyph(char)
+        if tile is not None:
+            fb.blend(x, y, *tile)
+        return self.cell
@@ -1,11 +1,37 @@
-from PIL import Image, ImageDraw, ImageFont
-import matplotlib.pyplot as plt
+import sys
+import json
 import time
+import base64
+import socket
+import struct
+import logging
+import argparse
+import threading
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from framebuffer import RGB565, FrameBuffer
+
+# Display code pushes frames here; the browser viewer is served on HTTP_PORT
+FRAME_PORT = 8765
+HTTP_PORT = 8000
+
+# Each frame message: magic, window x/y/w/h and the sender's wall-clock time,
+# followed by w*h big-endian RGB565 pixels
+FRAME_HEADER = struct.Struct("!4sHHHHd")
+FRAME_MAGIC = b"R565"
+
+# Browser updates are sent per changed tile
+TILE_SIZE = 16
+
 
 class MockLCD:
     def __init__(self):
         self.width = 240
-        self.height = 240
+        self.height = 135
         self.image = Image.new("RGB", (self.width, self.height), "WHITE")
         self.draw = ImageDraw.Draw(self.image)
 
@@ -25,55 +51,294 @@ class MockLCD:
     def module_exit(self):
         print("Mock display cleanup completed.")
 
-# Usage in your script
-if __name__ == "__main__":
-    try:
-        # Use the mock class instead of the actual display class
-        disp = MockLCD()
-        disp.Init()
-        disp.clear()
-        disp.bl_DutyCycle(50)
 
-        # Create blank image for drawing
-        Font1 = ImageFont.truetype("./Font/Font00.ttf", 30)
-        Font2 = ImageFont.truetype("./Font/Font00.ttf", 25)
-        Font3 = ImageFont.truetype("./Font/Font02.ttf", 25)
+class EmulatorLCD:
+    """Driver stand-in that streams frames to a running emulator server."""
+
+    def __init__(self, width=240, height=135, host="127.0.0.1", port=FRAME_PORT):
+        self.width = width
+        self.height = height
+        self.address = (host, port)
+        self.sock = None
+
+    def _connect(self):
+        try:
+            self.sock = socket.create_connection(self.address, timeout=1)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError as e:
+            logging.warning(f"Emulator not reachable at {self.address}: {e}")
+            self.sock = None
+
+    def Init(self):
+        self._connect()
+
+    def clear(self):
+        self.ShowBuffer(np.full((self.height, self.width), 0xFFFF, dtype=RGB565))
+
+    def ShowImage(self, image):
+        if image.size != (self.width, self.height):
+            raise ValueError('Image must be same dimensions as display ({0}x{1}).'
+                             .format(self.width, self.height))
+        self.ShowBuffer(FrameBuffer.from_image(image).buf)
+
+    def ShowBuffer(self, buf, Xstart=0, Ystart=0):
+        if self.sock is None:
+            self._connect()
+            if self.sock is None:
+                return
+        height, width = buf.shape
+        header = FRAME_HEADER.pack(FRAME_MAGIC, Xstart, Ystart, width, height, time.time())
+        try:
+            self.sock.sendall(header + np.ascontiguousarray(buf, dtype=RGB565).tobytes())
+        except OSError as e:
+            # Drop the frame rather than stall the display code; reconnect next time
+            logging.warning(f"Lost emulator connection: {e}")
+            self.sock.close()
+            self.sock = None
+
+    def bl_DutyCycle(self, duty):
+        logging.debug(f"Emulator backlight set to {duty}%.")
+
+    def module_exit(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
 
-        image2 = Image.new("RGB", (disp.width, disp.height), "WHITE")
-        draw = ImageDraw.Draw(image2)
+class _Viewer:
+    # Per-browser state: tiles changed since its last update. Frames that arrive
+    # while a viewer is still sending simply merge into the same dirty set.
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.dirty = set()
+        self.sent_time = None
+
+    def mark(self, tiles, sent_time):
+        with self.cond:
+            self.dirty.update(tiles)
+            self.sent_time = sent_time
+            self.cond.notify()
+
+    def take(self, timeout):
+        with self.cond:
+            if not self.dirty:
+                self.cond.wait(timeout)
+            tiles, self.dirty = self.dirty, set()
+            return tiles, self.sent_time
+
+
+class EmulatorServer:
+    def __init__(self, width=240, height=135, host="127.0.0.1",
+                 frame_port=FRAME_PORT, http_port=HTTP_PORT):
+        self.width = width
+        self.height = height
+        self.host = host
+        self.frame_port = frame_port
+        self.http_port = http_port
+
+        self.lock = threading.Lock()
+        self.canvas = np.full((height, width), 0xFFFF, dtype=RGB565)
+        self.viewers = set()
+
+        self.frame_count = 0
+        self.frame_times = []
+
+    # Frame intake
+
+    def receive(self, x, y, buf, sent_time):
+        h, w = buf.shape
+        # A window reaching past the canvas is a driver bug; clip it and keep
+        # the connection, since the payload has already been read in full
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, self.width), min(y + h, self.height)
+        if (x0, y0, x1, y1) != (x, y, x + w, y + h):
+            logging.warning(f"Window {w}x{h} at ({x}, {y}) is outside the "
+                            f"{self.width}x{self.height} canvas, clipping.")
+            if x0 >= x1 or y0 >= y1:
+                return
+            buf = buf[y0 - y:y1 - y, x0 - x:x1 - x]
+            x, y, h, w = x0, y0, y1 - y0, x1 - x0
+        with self.lock:
+            window = self.canvas[y:y + h, x:x + w]
+            changed = window != buf
+            window[:] = buf
+            tiles = self._changed_tiles(x, y, changed)
+            self.frame_count += 1
+            now = time.monotonic()
+            self.frame_times = [t for t in self.frame_times if now - t < 1.0] + [now]
+            viewers = list(self.viewers)
+        for viewer in viewers:
+            viewer.mark(tiles, sent_time)
+
+    def _changed_tiles(self, x, y, changed):
+        # Project the changed-pixel mask onto the tile grid in one pass
+        ys, xs = np.nonzero(changed)
+        if len(ys) == 0:
+            return set()
+        ty = (ys + y) // TILE_SIZE
+        tx = (xs + x) // TILE_SIZE
+        return set(zip(tx.tolist(), ty.tolist()))
+
+    def tile_payload(self, tiles):
+        out = []
+        with self.lock:
+            for tx, ty in sorted(tiles):
+                x, y = tx * TILE_SIZE, ty * TILE_SIZE
+                tile = self.canvas[y:y + TILE_SIZE, x:x + TILE_SIZE]
+                h, w = tile.shape
+                out.append([x, y, w, h, base64.b64encode(tile.tobytes()).decode("ascii")])
+        return out
 
-        draw.rectangle((1, 1, 2, 2), fill="BLACK")
-        draw.rectangle((1, 7, 3, 10), fill="BLACK")
-        draw.rectangle((1, 13, 4, 17), fill="BLACK")
-        draw.rectangle((1, 19, 5, 24), fill="BLACK")
+    def all_tiles(self):
+        return {(tx, ty)
+                for ty in range((self.height + TILE_SIZE - 1) // TILE_SIZE)
+                for tx in range((self.width + TILE_SIZE - 1) // TILE_SIZE)}
 
-        draw.line([(20, 1), (50, 31)], fill="RED", width=1)
-        draw.line([(50, 1), (20, 31)], fill="RED", width=1)
-        draw.line([(90, 17), (122, 17)], fill="RED", width=1)
-        draw.line([(106, 1), (106, 33)], fill="RED", width=1)
+    @property
+    def fps(self):
+        return len(self.frame_times)
 
-        draw.rectangle([(20, 1), (50, 31)], fill="WHITE", outline="BLUE")
-        draw.rectangle([(55, 1), (85, 31)], fill="BLUE")
+    # Servers
 
-        draw.arc((90, 1, 122, 33), 0, 360, fill=(0, 255, 0))
-        draw.ellipse((125, 1, 158, 33), fill=(0, 255, 0))
+    def serve_forever(self):
+        server = self
 
-        draw.text((1, 45), u'Hellow WaveShare', font=Font2, fill="BLACK")
-        draw.text((90, 82), u'0123456789', font=Font2, fill="RED")
-        draw.text((0, 85), u'你好微雪', font=Font3, fill="BLUE")
-        disp.ShowImage(image2)
+        class FrameHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                logging.info(f"Display connected from {self.client_address}")
+                while True:
+                    header = self.rfile.read(FRAME_HEADER.size)
+                    if len(header) < FRAME_HEADER.size:
+                        break
+                    magic, x, y, w, h, sent_time = FRAME_HEADER.unpack(header)
+                    if magic != FRAME_MAGIC:
+                        logging.error("Bad frame header, dropping connection.")
+                        break
+                    data = self.rfile.read(w * h * 2)
+                    if len(data) < w * h * 2:
+                        break
+                    server.receive(x, y, np.frombuffer(data, dtype=RGB565).reshape(h, w), sent_time)
 
-        time.sleep(2)
+        class ViewerHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/":
+                    body = VIEWER_HTML.replace("{scale}", "3").encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/html; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                elif self.path == "/events":
+                    self.stream()
+                else:
+                    self.send_error(404)
 
-        image = Image.open('./pic/LCD_1inch14.jpg')
-        disp.ShowImage(image)
-        time.sleep(2)
+            def stream(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
 
-        disp.module_exit()
+                viewer = _Viewer()
+                viewer.mark(server.all_tiles(), None)
+                with server.lock:
+                    server.viewers.add(viewer)
+                try:
+                    while True:
+                        tiles, sent_time = viewer.take(timeout=1.0)
+                        event = {"w": server.width, "h": server.height,
+                                 "fps": server.fps, "sent": sent_time,
+                                 "tiles": server.tile_payload(tiles)}
+                        self.wfile.write(b"data: " + json.dumps(event).encode("ascii") + b"\n\n")
+                        self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with server.lock:
+                        server.viewers.discard(viewer)
 
-    except IOError as e:
-        print(e)
+            def log_message(self, format, *args):
+                logging.debug(format % args)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        frames = socketserver.ThreadingTCPServer((self.host, self.frame_port), FrameHandler)
+        frames.daemon_threads = True
+        http = ThreadingHTTPServer((self.host, self.http_port), ViewerHandler)
+        http.daemon_threads = True
+
+        threading.Thread(target=frames.serve_forever, daemon=True).start()
+        logging.info(f"Receiving frames on {self.host}:{self.frame_port}")
+        logging.info(f"Viewer at http://{self.host}:{self.http_port}/")
+        try:
+            http.serve_forever()
+        finally:
+            frames.shutdown()
+            http.server_close()
+            frames.server_close()
+
+
+VIEWER_HTML = """<!doctype html>
+<html>
+<head>
+<title>rasp_disp emulator</title>
+<style>
+  body { background: #111; color: #ddd; font: 13px monospace; }
+  #wrap { position: relative; display: inline-block; }
+  canvas { image-rendering: pixelated; border: 1px solid #444; }
+  #overlay { position: absolute; top: 4px; left: 6px; background: rgba(0,0,0,.6);
+             padding: 2px 6px; pointer-events: none; }
+</style>
+</head>
+<body>
+<div id="wrap"><canvas id="lcd"></canvas><div id="overlay">waiting for frames</div></div>
+<script>
+const canvas = document.getElementById("lcd");
+const ctx = canvas.getContext("2d");
+const overlay = document.getElementById("overlay");
+let latency = 0;
+
+new EventSource("/events").onmessage = (msg) => {
+  const ev = JSON.parse(msg.data);
+  if (canvas.width !== ev.w || canvas.height !== ev.h) {
+    canvas.width = ev.w; canvas.height = ev.h;
+    canvas.style.width = (ev.w * {scale}) + "px";
+    canvas.style.height = (ev.h * {scale}) + "px";
+  }
+  for (const [x, y, w, h, b64] of ev.tiles) {
+    const raw = atob(b64);
+    const img = ctx.createImageData(w, h);
+    for (let i = 0, p = 0; i < raw.length; i += 2, p += 4) {
+      const v = (raw.charCodeAt(i) << 8) | raw.charCodeAt(i + 1);
+      img.data[p] = (v >> 8) & 0xF8;
+      img.data[p + 1] = (v >> 3) & 0xFC;
+      img.data[p + 2] = (v << 3) & 0xF8;
+      img.data[p + 3] = 255;
+    }
+    ctx.putImageData(img, x, y);
+  }
+  if (ev.sent !== null && ev.tiles.length) {
+    latency = Date.now() - ev.sent * 1000;
+  }
+  overlay.textContent = ev.fps + " fps | " + latency.toFixed(1) + " ms | " + ev.tiles.length + " tiles";
+};
+</script>
+</body>
+</html>
+"""
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Stream Display frames to a browser viewer.")
+    parser.add_argument("--width", type=int, default=240)
+    parser.add_argument("--height", type=int, default=135)
+    parser.add_argument("--frame-port", type=int, default=FRAME_PORT)
+    parser.add_argument("--http-port", type=int, default=HTTP_PORT)
+    args = parser.parse_args()
+
+    try:
+        EmulatorServer(args.width, args.height, frame_port=args.frame_port,
+                       http_port=args.http_port).serve_forever()
     except KeyboardInterrupt:
-        disp.module_exit()
         print("quit:")
-        exit()
+        sys.exit()
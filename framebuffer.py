@@ -0,0 +1,224 @@
+import zlib
+
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw
+
+# Panels take RGB565 with the high byte first, so a big-endian uint16 array
+# can be handed to the SPI driver without any further packing
+RGB565 = np.dtype('>u2')
+
+# Variation selectors and joiners are never drawn on their own
+SKIP_CODEPOINTS = {0xFE0E, 0xFE0F, 0x200D}
+
+# 1x1 canvas used only for text measurement
+_SCRATCH = ImageDraw.Draw(Image.new("L", (1, 1)))
+
+
+def to_rgb(color):
+    # Accept PIL colour names ("WHITE"), hex strings and RGB(A) tuples
+    if isinstance(color, str):
+        color = ImageColor.getrgb(color)
+    return tuple(color[:3])
+
+
+def rgb565(color):
+    r, g, b = to_rgb(color)
+    return ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
+
+
+def pack_rgb565(rgb):
+    # (..., 3) uint8 RGB array -> (...) big-endian RGB565 array
+    rgb = np.asarray(rgb, dtype=np.uint16)
+    packed = ((rgb[..., 0] & 0xF8) << 8) | ((rgb[..., 1] & 0xFC) << 3) | (rgb[..., 2] >> 3)
+    return packed.astype(RGB565)
+
+
+def unpack_rgb565(buf):
+    # (...) RGB565 array -> (..., 3) uint8 RGB array, low bits replicated
+    v = np.asarray(buf).astype(np.uint16)
+    r = (v >> 11) & 0x1F
+    g = (v >> 5) & 0x3F
+    b = v & 0x1F
+    rgb = np.empty(v.shape + (3,), dtype=np.uint8)
+    rgb[..., 0] = (r << 3) | (r >> 2)
+    rgb[..., 1] = (g << 2) | (g >> 4)
+    rgb[..., 2] = (b << 3) | (b >> 2)
+    return rgb
+
+
+def frame_hash(buf):
+    # CRC32 over the raw RGB565 bytes: cheap enough to run on every refresh
+    return zlib.crc32(np.ascontiguousarray(buf))
+
+
+def text_bbox(text, font):
+    # Same box ImageDraw.text would cover when drawn at (0, 0), newlines included
+    return _SCRATCH.textbbox((0, 0), text, font=font)
+
+
+def image_to_rgb565(image):
+    # PIL input path: anything PIL can open ends up as an RGB565 array
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return pack_rgb565(np.asarray(image))
+
+
+class FrameBuffer:
+    def __init__(self, width, height, color=0):
+        self.width = width
+        self.height = height
+        self.buf = np.empty((height, width), dtype=RGB565)
+        self.fill(color)
+
+    @classmethod
+    def from_image(cls, image):
+        fb = cls(image.width, image.height)
+        fb.buf[:] = image_to_rgb565(image)
+        return fb
+
+    @classmethod
+    def from_array(cls, buf):
+        fb = cls.__new__(cls)
+        fb.height, fb.width = buf.shape
+        fb.buf = np.asarray(buf, dtype=RGB565)
+        return fb
+
+    def copy(self):
+        return FrameBuffer.from_array(self.buf.copy())
+
+    def to_image(self):
+        return Image.fromarray(unpack_rgb565(self.buf), "RGB")
+
+    def tobytes(self):
+        return self.buf.tobytes()
+
+    def _clip(self, x0, y0, x1, y1):
+        # Clamp an exclusive-end rectangle to the buffer
+        return (max(0, int(x0)), max(0, int(y0)),
+                min(self.width, int(x1)), min(self.height, int(y1)))
+
+    def fill(self, color):
+        self.buf[:] = self._color(color)
+
+    def fill_rect(self, x, y, w, h, color):
+        x0, y0, x1, y1 = self._clip(x, y, x + w, y + h)
+        if x0 < x1 and y0 < y1:
+            self.buf[y0:y1, x0:x1] = self._color(color)
+
+    def rect(self, x, y, w, h, color):
+        # One pixel outline
+        self.fill_rect(x, y, w, 1, color)
+        self.fill_rect(x, y + h - 1, w, 1, color)
+        self.fill_rect(x, y, 1, h, color)
+        self.fill_rect(x + w - 1, y, 1, h, color)
+
+    def blit(self, src, x=0, y=0):
+        # Copy another FrameBuffer or RGB565 array in at (x, y), clipped
+        src = src.buf if isinstance(src, FrameBuffer) else np.asarray(src, dtype=RGB565)
+        h, w = src.shape
+        x0, y0, x1, y1 = self._clip(x, y, x + w, y + h)
+        if x0 < x1 and y0 < y1:
+            self.buf[y0:y1, x0:x1] = src[y0 - y:y1 - y, x0 - x:x1 - x]
+
+    def line(self, x0, y0, x1, y1, color, width=1):
+        c = self._color(color)
+        x0, y0, x1, y1 = int(round(x0)), int(round(y0)), int(round(x1)), int(round(y1))
+        if y0 == y1:
+            # Horizontal and vertical lines are the common case (bars, markers)
+            lo, hi = sorted((x0, x1))
+            self.fill_rect(lo, y0 - (width - 1) // 2, hi - lo + 1, width, c)
+            return
+        if x0 == x1:
+            lo, hi = sorted((y0, y1))
+            self.fill_rect(x0 - (width - 1) // 2, lo, width, hi - lo + 1, c)
+            return
+        # Sample the segment once per pixel step along the major axis
+        n = max(abs(x1 - x0), abs(y1 - y0)) + 1
+        xs = np.rint(np.linspace(x0, x1, n)).astype(np.intp)
+        ys = np.rint(np.linspace(y0, y1, n)).astype(np.intp)
+        for d in range(-((width - 1) // 2), width // 2 + 1):
+            if abs(x1 - x0) >= abs(y1 - y0):
+                px, py = xs, ys + d
+            else:
+                px, py = xs + d, ys
+            keep = (px >= 0) & (px < self.width) & (py >= 0) & (py < self.height)
+            self.buf[py[keep], px[keep]] = c
+
+    def bar(self, x, y, w, h, start_color, end_color=None):
+        # Filled bar with an optional top-to-bottom gradient
+        if end_color is None:
+            self.fill_rect(x, y, w, h, start_color)
+            return
+        start = np.array(to_rgb(start_color), float)
+        end = np.array(to_rgb(end_color), float)
+        t = np.arange(h)[:, None] / h
+        rows = pack_rgb565((start + (end - start) * t).astype(np.uint8))
+        x0, y0, x1, y1 = self._clip(x, y, x + w, y + h)
+        if x0 < x1 and y0 < y1:
+            self.buf[y0:y1, x0:x1] = rows[y0 - y:y1 - y, None]
+
+    def mask(self, x, y, alpha, color):
+        # Blend a solid colour through an 8-bit alpha mask (text, antialiased shapes)
+        alpha = np.asarray(alpha)
+        h, w = alpha.shape
+        x0, y0, x1, y1 = self._clip(x, y, x + w, y + h)
+        if x0 >= x1 or y0 >= y1:
+            return
+        a = alpha[y0 - y:y1 - y, x0 - x:x1 - x].astype(np.uint16)[..., None]
+        dst = self.buf[y0:y1, x0:x1]
+        src = np.array(to_rgb(color), np.uint16)
+        rgb = (unpack_rgb565(dst) * (255 - a) + src * a + 127) // 255
+        dst[:] = pack_rgb565(rgb)
+
+    def blend(self, x, y, tile, alpha):
+        # Alpha-blend an RGB565 tile (colour glyphs, icons) through its own mask
+        h, w = tile.shape
+        x0, y0, x1, y1 = self._clip(x, y, x + w, y + h)
+        if x0 >= x1 or y0 >= y1:
+            return
+        a = alpha[y0 - y:y1 - y, x0 - x:x1 - x].astype(np.uint16)[..., None]
+        dst = self.buf[y0:y1, x0:x1]
+        src = unpack_rgb565(tile[y0 - y:y1 - y, x0 - x:x1 - x])
+        rgb = (unpack_rgb565(dst) * (255 - a) + src * a + 127) // 255
+        dst[:] = pack_rgb565(rgb)
+
+    def text(self, xy, text, font, color, atlas=None):
+        if atlas is not None and any(ch in atlas for ch in text):
+            self._text_with_glyphs(xy, text, font, color, atlas)
+            return
+        # Rasterize the text once as an alpha mask and blend it in
+        bbox = text_bbox(text, font)
+        w, h = bbox[2] - bbox[0], bbox[3] - bbox[1]
+        if w <= 0 or h <= 0:
+            return
+        mask = Image.new("L", (w, h), 0)
+        ImageDraw.Draw(mask).text((-bbox[0], -bbox[1]), text, font=font, fill=255)
+        self.mask(int(xy[0]) + bbox[0], int(xy[1]) + bbox[1], np.asarray(mask), color)
+
+    def _text_with_glyphs(self, xy, text, font, color, atlas):
+        # Plain runs go through the font, atlas glyphs are blitted by codepoint
+        ascent, descent = font.getmetrics()
+        line_height = ascent + descent + 4
+        x0, y = int(xy[0]), int(xy[1])
+        for line in text.split("\n"):
+            x, run = x0, ""
+            for ch in line + "\n":
+                if ord(ch) in SKIP_CODEPOINTS:
+                    continue
+                tile = atlas.glyph(ch) if ch != "\n" else None
+                if tile is None and ch != "\n":
+                    run += ch
+                    continue
+                if run:
+                    self.text((x, y), run, font, color)
+                    x += int(font.getlength(run))
+                    run = ""
+                if tile is not None:
+                    self.blend(x, y + (ascent + descent - atlas.cell) // 2, *tile)
+                    x += atlas.cell + 1
+            y += line_height
+
+    def _color(self, color):
+        if isinstance(color, (int, np.integer)):
+            return color
+        return rgb565(color)
@@ -0,0 +1,165 @@
+import mmap
+import time
+import struct
+
+import numpy as np
+
+from asset_cache import fit_image
+from framebuffer import RGB565, FrameBuffer, image_to_rgb565
+
+# File layout (little-endian):
+#   header   magic, version, width, height, frame count, default delay (ms), flags
+#   index    one entry per frame: payload offset, payload size, window count, delay (ms)
+#   payload  per frame, each window as x, y, w, h followed by w*h big-endian RGB565
+# Window pixels are stored exactly as the panel wants them, so playback maps
+# the file and hands each window to the driver without touching the pixels.
+MAGIC = b"RGB565SQ"
+VERSION = 1
+HEADER = struct.Struct("<8sHHHIHH")
+INDEX = np.dtype([("offset", "<u8"), ("size", "<u4"), ("windows", "<u2"), ("delay", "<u2")])
+WINDOW = struct.Struct("<HHHH")
+
+# Changed bands closer than this many rows are merged into one window
+MERGE_GAP = 8
+MAX_WINDOWS = 4
+
+# Above this share of changed pixels a plain full frame is smaller to store
+KEYFRAME_RATIO = 0.75
+
+
+def changed_windows(prev, cur, max_windows=MAX_WINDOWS):
+    # Bounding boxes (x, y, w, h) of the row bands that differ between two frames
+    diff = prev != cur
+    rows = np.flatnonzero(diff.any(axis=1))
+    if len(rows) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(rows) > MERGE_GAP)
+    bands = list(zip(np.r_[rows[0], rows[breaks + 1]], np.r_[rows[breaks], rows[-1]] + 1))
+    while len(bands) > max_windows:
+        # Merge the pair with the smallest gap until few enough windows remain
+        gaps = [bands[i + 1][0] - bands[i][1] for i in range(len(bands) - 1)]
+        i = int(np.argmin(gaps))
+        bands[i:i + 2] = [(bands[i][0], bands[i + 1][1])]
+    windows = []
+    for y0, y1 in bands:
+        cols = np.flatnonzero(diff[y0:y1].any(axis=0))
+        windows.append((int(cols[0]), int(y0), int(cols[-1] + 1 - cols[0]), int(y1 - y0)))
+    return windows
+
+
+def write_sequence(path, frames, delay=100, delays=None, delta=True):
+    # frames: RGB565 arrays or FrameBuffers of one size; delay in milliseconds
+    frames = [f.buf if isinstance(f, FrameBuffer) else np.asarray(f, dtype=RGB565) for f in frames]
+    if not frames:
+        raise ValueError("Cannot write an empty frame sequence.")
+    height, width = frames[0].shape
+    delays = delays or [delay] * len(frames)
+
+    payloads = []
+    prev = None
+    for frame in frames:
+        if prev is None or not delta:
+            windows = [(0, 0, width, height)]
+        else:
+            windows = changed_windows(prev, frame)
+            if sum(w * h for _, _, w, h in windows) > KEYFRAME_RATIO * width * height:
+                windows = [(0, 0, width, height)]
+        chunks = []
+        for x, y, w, h in windows:
+            chunks.append(WINDOW.pack(x, y, w, h))
+            chunks.append(np.ascontiguousarray(frame[y:y + h, x:x + w], dtype=RGB565).tobytes())
+        payloads.append((len(windows), b"".join(chunks)))
+        prev = frame
+
+    index = np.zeros(len(frames), dtype=INDEX)
+    offset = HEADER.size + index.nbytes
+    for i, ((count, data), d) in enumerate(zip(payloads, delays)):
+        index[i] = (offset, len(data), count, int(d))
+        offset += len(data)
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, width, height, len(frames), int(delay), 1 if delta else 0))
+        f.write(index.tobytes())
+        for _, data in payloads:
+            f.write(data)
+    return path
+
+
+def encode_animation(source, path, size=(240, 135), policy="letterbox", delta=True):
+    # Pre-encode a GIF / APNG / MJPEG once for instant replays
+    from playback import image_frames, mjpeg_frames
+    frames = mjpeg_frames(source) if source.lower().endswith((".mjpeg", ".mjpg")) else image_frames(source)
+    bufs, delays = [], []
+    for image, duration in frames:
+        bufs.append(image_to_rgb565(fit_image(image, size, policy)))
+        delays.append(round((duration or 0.1) * 1000))
+    return write_sequence(path, bufs, delays=delays, delta=delta)
+
+
+class FrameSequence:
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.width, self.height, count, self.delay, self.flags = \
+            HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} RGB565 frame sequence.")
+        self.index = np.frombuffer(self._map, dtype=INDEX, count=count, offset=HEADER.size)
+
+    def __len__(self):
+        return len(self.index)
+
+    def close(self):
+        self.index = None
+        self._map.close()
+        self._file.close()
+
+    def windows(self, i):
+        # (x, y, pixels) per window; pixels are zero-copy views into the map
+        entry = self.index[i]
+        pos = int(entry["offset"])
+        out = []
+        for _ in range(int(entry["windows"])):
+            x, y, w, h = WINDOW.unpack_from(self._map, pos)
+            pos += WINDOW.size
+            out.append((x, y, np.frombuffer(self._map, dtype=RGB565, count=w * h, offset=pos).reshape(h, w)))
+            pos += w * h * 2
+        return out
+
+    def play(self, display, fps=None, loops=1):
+        # Frames that fall a whole slot behind are folded into the shadow frame
+        # only; the next frame sent then covers everything they changed
+        shown = dropped = 0
+        start = time.monotonic()
+        due = start
+        pending = None  # dirty (x0, y0, x1, y1) from dropped frames
+        total = len(self) * loops
+        for n in range(total):
+            i = n % len(self)
+            interval = 1.0 / fps if fps else int(self.index[i]["delay"]) / 1000
+            windows = self.windows(i)
+            now = time.monotonic()
+            if now > due + interval and n < total - 1:
+                for x, y, buf in windows:
+                    display.fb.blit(buf, x, y)
+                    h, w = buf.shape
+                    box = (x, y, x + w, y + h)
+                    pending = box if pending is None else (min(pending[0], box[0]), min(pending[1], box[1]),
+                                                           max(pending[2], box[2]), max(pending[3], box[3]))
+                dropped += 1
+            else:
+                if due > now:
+                    time.sleep(due - now)
+                if pending is not None:
+                    x0, y0, x1, y1 = pending
+                    for x, y, buf in windows:
+                        display.fb.blit(buf, x, y)
+                    display.show_window(x0, y0, display.fb.buf[y0:y1, x0:x1].copy())
+                    pending = None
+                for x, y, buf in windows:
+                    display.show_window(x, y, buf)
+                shown += 1
+            due += interval
+        elapsed = time.monotonic() - start
+        return {"frames": total, "shown": shown, "dropped": dropped,
+                "fps": shown / elapsed if elapsed else 0.0, "seconds": elapsed}
@@ -0,0 +1,121 @@
+import os
+import time
+import logging
+from collections import deque, namedtuple
+
+import numpy as np
+
+from framebuffer import RGB565, FrameBuffer
+
+# One entry per transmitted frame: when it arrived, how long since the previous
+# one and which window of the panel it covered
+FrameRecord = namedtuple("FrameRecord", "index time interval window")
+
+
+class HeadlessDisplay:
+    """Driver stand-in that keeps frames in memory instead of opening a viewer.
+
+    It implements the same surface as the LCD drivers (Init, clear, ShowImage,
+    ShowBuffer, bl_DutyCycle, module_exit), so the real Display code can run
+    unchanged in tests, soak runs and benchmarks.
+    """
+
+    def __init__(self, width=240, height=135, capacity=256, record_dir=None):
+        self.width = width
+        self.height = height
+        self.backlight = 50
+        self.record_dir = record_dir
+
+        # Panel memory, so windowed writes compose the same way they do on the LCD
+        self.canvas = np.full((height, width), 0xFFFF, dtype=RGB565)
+
+        # Ring buffers of the most recent frames and their timings
+        self.frames = deque(maxlen=capacity)
+        self.records = deque(maxlen=capacity)
+        self.frame_count = 0
+        self._last_time = None
+
+        if record_dir is not None:
+            os.makedirs(record_dir, exist_ok=True)
+
+    def Init(self):
+        logging.debug("Headless display initialized.")
+
+    def clear(self):
+        self.canvas[:] = 0xFFFF
+
+    def ShowImage(self, image):
+        if image.size != (self.width, self.height):
+            raise ValueError('Image must be same dimensions as display ({0}x{1}).'
+                             .format(self.width, self.height))
+        self.ShowBuffer(FrameBuffer.from_image(image).buf)
+
+    def ShowBuffer(self, buf, Xstart=0, Ystart=0):
+        now = time.perf_counter()
+        height, width = buf.shape
+        self.canvas[Ystart:Ystart + height, Xstart:Xstart + width] = buf
+
+        interval = None if self._last_time is None else now - self._last_time
+        self._last_time = now
+        self.frames.append(self.canvas.copy())
+        self.records.append(FrameRecord(self.frame_count, now, interval, (Xstart, Ystart, width, height)))
+
+        if self.record_dir is not None:
+            self.frame(-1).to_image().save(
+                os.path.join(self.record_dir, "frame_{0:06d}.png".format(self.frame_count)))
+        self.frame_count += 1
+
+    def bl_DutyCycle(self, duty):
+        self.backlight = duty
+
+    def module_exit(self):
+        logging.debug("Headless display exiting.")
+
+    # Access for tests
+
+    def frame(self, index=-1):
+        return FrameBuffer.from_array(self.frames[index])
+
+    @property
+    def last_frame(self):
+        return self.frame(-1) if self.frames else None
+
+    def images(self):
+        return [FrameBuffer.from_array(f).to_image() for f in self.frames]
+
+    def stats(self):
+        intervals = [r.interval for r in self.records if r.interval is not None]
+        if not intervals:
+            return {"frames": self.frame_count, "fps": None,
+                    "min_interval": None, "max_interval": None}
+        return {
+            "frames": self.frame_count,
+            "fps": len(intervals) / sum(intervals) if sum(intervals) > 0 else None,
+            "min_interval": min(intervals),
+            "max_interval": max(intervals),
+        }
+
+    # Exports
+
+    def save_png(self, directory, prefix="frame"):
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        first = self.frame_count - len(self.frames)
+        for i, image in enumerate(self.images()):
+            path = os.path.join(directory, "{0}_{1:06d}.png".format(prefix, first + i))
+            image.save(path)
+            paths.append(path)
+        return paths
+
+    def save_apng(self, path, fps=None):
+        # Without a fixed fps, replay with the recorded frame intervals
+        images = self.images()
+        if not images:
+            return None
+        if fps:
+            durations = [1000 / fps] * len(images)
+        else:
+            durations = [int((r.interval or 0) * 1000) or 1 for r in list(self.records)[1:]] + [100]
+        images[0].save(path, format="PNG", save_all=True, append_images=images[1:],
+                       duration=durations, loop=0)
+        return path
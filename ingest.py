@@ -0,0 +1,217 @@
+import csv
+import math
+import time
+import calendar
+import asyncio
+import logging
+import argparse
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from smoothing import Ema
+from tsstore import CSV_PATH, open_store
+
+# One sensor reading; ts in epoch seconds
+Sample = namedtuple("Sample", "ts temp moist")
+
+# Readings outside these ranges are sensor glitches, not weather
+TEMP_RANGE = (-40.0, 85.0)
+MOIST_RANGE = (0.0, 100.0)
+
+# Moisture band the dashboard marks as optimal (see MOISTURE_SCREEN)
+OPTIMAL_MOIST = (20.0, 40.0)
+
+# Smoothing of the values on the dashboard, per sample
+DISPLAY_ALPHA = 0.3
+
+STORE_QUEUE_SIZE = 1024
+STORE_BATCH = 256
+
+
+def validate(sample, last_ts=None):
+    # Returns a reason to reject the sample, or None if it is fine
+    if not all(math.isfinite(v) for v in (sample.temp, sample.moist)):
+        return "non-finite value"
+    if not TEMP_RANGE[0] <= sample.temp <= TEMP_RANGE[1]:
+        return f"temperature {sample.temp} out of range"
+    if not MOIST_RANGE[0] <= sample.moist <= MOIST_RANGE[1]:
+        return f"moisture {sample.moist} out of range"
+    if last_ts is not None and sample.ts < last_ts:
+        return f"timestamp {sample.ts} older than {last_ts}"
+    return None
+
+
+class CsvReplaySource:
+    """Stand-in sensor: replays a Timestamp,Temp,Moist CSV.
+
+    Gaps between readings are divided by `speed` (0 replays as fast as the
+    pipeline takes them). With `start`, timestamps are shifted so the first
+    reading lands there, which lets a replay continue an existing history.
+    """
+
+    def __init__(self, path=CSV_PATH, speed=60.0, start=None):
+        self.path = path
+        self.speed = speed
+        self.start = start
+
+    async def __aiter__(self):
+        with open(self.path, newline="") as f:
+            rows = [row for row in csv.DictReader(f) if row["Timestamp"]]
+        ts = np.array([row["Timestamp"] for row in rows], dtype="datetime64[s]").astype(np.int64)
+        order = np.argsort(ts, kind="stable")
+        shift = self.start - int(ts[order[0]]) if self.start is not None and len(ts) else 0
+        previous = None
+        for i in order:
+            t = int(ts[i])
+            if previous is not None and self.speed:
+                await asyncio.sleep((t - previous) / self.speed)
+            previous = t
+            yield Sample(t + shift, float(rows[i]["Temp"]), float(rows[i]["Moist"]))
+
+
+class PollingSource:
+    """Polls a blocking read() -> (temp, moist) every `interval` seconds.
+
+    The read runs in a worker thread so a slow sensor bus never stalls the loop.
+    Samples are stamped with local wall-clock time stored as if it were UTC,
+    the same convention the store uses for the imported CSV.
+    """
+
+    def __init__(self, read, interval=60.0):
+        self.read = read
+        self.interval = interval
+
+    async def __aiter__(self):
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic()
+        while True:
+            temp, moist = await loop.run_in_executor(None, self.read)
+            yield Sample(calendar.timegm(time.localtime()), float(temp), float(moist))
+            deadline += self.interval
+            await asyncio.sleep(max(0.0, deadline - time.monotonic()))
+
+
+def status_text(sample, stats):
+    # Dashboard text; the status follows the last hour's mean, not one reading
+    mean = stats["moist"].mean if stats["moist"].count else sample.moist
+    if mean > OPTIMAL_MOIST[1]:
+        status = "Too wet"
+    elif mean < OPTIMAL_MOIST[0]:
+        status = "Too dry"
+    else:
+        status = "OK"
+    return f"Status: {status}\nTemp: {sample.temp:.1f}°C\nMoist: {sample.moist:.0f}%\nAvg 1h: {mean:.0f}%"
+
+
+class Ingest:
+    """Fans sensor samples out to the store and the display.
+
+    Sources feed a bounded store queue, drained in batches by one writer, so
+    every valid sample is stored. The display gets a one-slot mailbox: a new
+    sample replaces one not yet shown, so a slow SPI refresh only ever skips
+    stale frames. Rendering and SPI run in a worker thread off the loop.
+    """
+
+    def __init__(self, store, display=None, render=None, queue_size=STORE_QUEUE_SIZE):
+        self.store = store
+        self.display = display
+        self.render = render or self.render_status
+        self.store_queue = asyncio.Queue(maxsize=queue_size)
+        self.display_slot = asyncio.Queue(maxsize=1)
+        self._last_ts = int(store.ts[-1]) if len(store) else None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-display")
+        self.counts = {"received": 0, "rejected": 0, "stored": 0, "shown": 0, "coalesced": 0}
+        # The display shows smoothed readings; the store keeps the raw ones
+        self.filters = {"temp": Ema(DISPLAY_ALPHA), "moist": Ema(DISPLAY_ALPHA)}
+
+    def render_status(self, sample, stats):
+        return self.display.render_moisture_with_text(sample.moist, status_text(sample, stats))
+
+    async def _pump(self, source):
+        async for sample in source:
+            self.counts["received"] += 1
+            reason = validate(sample, self._last_ts)
+            if reason:
+                self.counts["rejected"] += 1
+                logging.warning(f"Rejected sample: {reason}.")
+                continue
+            self._last_ts = sample.ts
+            await self.store_queue.put(sample)
+            sample = sample._replace(temp=self.filters["temp"].update(sample.temp),
+                                     moist=self.filters["moist"].update(sample.moist))
+            if self.display is not None:
+                if self.display_slot.full():
+                    self.display_slot.get_nowait()
+                    self.display_slot.task_done()
+                    self.counts["coalesced"] += 1
+                self.display_slot.put_nowait(sample)
+
+    async def _write(self):
+        while True:
+            batch = [await self.store_queue.get()]
+            while len(batch) < STORE_BATCH and not self.store_queue.empty():
+                batch.append(self.store_queue.get_nowait())
+            ts, temp, moist = zip(*batch)
+            self.store.extend(np.array(ts), np.array(temp), np.array(moist))
+            self.counts["stored"] += len(batch)
+            for _ in batch:
+                self.store_queue.task_done()
+
+    async def _show(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            sample = await self.display_slot.get()
+            try:
+                # Wait for the writer so the last hour's stats include this
+                # sample; read here because the store is only touched on the loop
+                await self.store_queue.join()
+                stats = self.store.stats(sample.ts - 3600, sample.ts + 1)
+                await loop.run_in_executor(self._executor, self._refresh, sample, stats)
+                self.counts["shown"] += 1
+            except Exception:
+                logging.exception("Display refresh failed.")
+            finally:
+                self.display_slot.task_done()
+
+    def _refresh(self, sample, stats):
+        self.display.show_frame(self.render(sample, stats))
+
+    async def run(self, *sources):
+        # Until every source is exhausted; then flush the store queue and the
+        # last pending display update
+        workers = [asyncio.create_task(self._write())]
+        if self.display is not None:
+            workers.append(asyncio.create_task(self._show()))
+        try:
+            await asyncio.gather(*(self._pump(source) for source in sources))
+            await self.store_queue.join()
+            await self.display_slot.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self._executor.shutdown(wait=True)
+        return self.counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay sensor readings into the store and display.")
+    parser.add_argument("--csv", default=CSV_PATH, help="CSV to replay")
+    parser.add_argument("--speed", type=float, default=600.0, help="replay speed-up, 0 for as fast as possible")
+    parser.add_argument("--no-display", action="store_true", help="store only")
+    args = parser.parse_args()
+
+    store = open_store()
+    start = int(store.ts[-1]) + 60 if len(store) else None
+    display = None
+    if not args.no_display:
+        from disp_manager import Display
+        display = Display()
+    counts = asyncio.run(Ingest(store, display).run(CsvReplaySource(args.csv, args.speed, start)))
+    logging.info(f"Ingest finished: {counts}")
+
+
+if __name__ == "__main__":
+    main()
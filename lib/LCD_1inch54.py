@@ -6,6 +6,11 @@ class LCD_1inch54(lcdconfig.RaspberryPi):
 
     width = 240
     height = 240 
+    # Hardware scrolling runs along the 320 gate lines. With MADCTL 0x70 they
+    # are the panel's x axis.
+    SCROLL_AXIS = 'x'
+    SCROLL_OFFSET = 0
+    SCROLL_LINES = 320
     def command(self, cmd):
         self.digital_write(self.DC_PIN, False)
         self.spi_writebyte([cmd])
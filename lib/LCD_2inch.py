@@ -6,6 +6,11 @@ class LCD_2inch(lcdconfig.RaspberryPi):
 
     width = 240
     height = 320 
+    # Hardware scrolling runs along the 320 gate lines, the y axis in the
+    # default portrait orientation.
+    SCROLL_AXIS = 'y'
+    SCROLL_OFFSET = 0
+    SCROLL_LINES = 320
     def command(self, cmd):
         self.digital_write(self.DC_PIN, False)
         self.spi_writebyte([cmd])
@@ -80,6 +80,32 @@ class RaspberryPi:
         if self.SPI!=None :
             self.SPI.writebytes(data)
 
+    def spi_writebuffer(self, data):
+        # writebytes2 takes any buffer (bytes, numpy arrays, mmaps) and
+        # splits it into bus-sized transfers itself
+        if self.SPI!=None :
+            self.SPI.writebytes2(data)
+
+    def ShowBuffer(self, buf, Xstart=0, Ystart=0):
+        """Write a big-endian RGB565 array straight to a window of the display"""
+        height, width = buf.shape
+        self.SetWindows(Xstart, Ystart, Xstart + width, Ystart + height)
+        self.digital_write(self.DC_PIN,True)
+        self.spi_writebuffer(self.np.ascontiguousarray(buf))
+
+    def SetScrollArea(self, top, height, bottom):
+        """Define the hardware scrolling area (VSCRDEF), in gate lines"""
+        self.command(0x33)
+        for value in (top, height, bottom):
+            self.data(value>>8 & 0xff)
+            self.data(value & 0xff)
+
+    def SetScrollStart(self, line):
+        """Set the memory line shown at the top of the scrolling area (VSCSAD)"""
+        self.command(0x37)
+        self.data(line>>8 & 0xff)
+        self.data(line & 0xff)
+
     def bl_DutyCycle(self, duty):
         self.BL_PIN.value = duty / 100
         
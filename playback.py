@@ -0,0 +1,165 @@
+import io
+import time
+import queue
+import logging
+import threading
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+from asset_cache import fit_image
+from framebuffer import pack_rgb565
+
+# JPEG start / end of image markers, used to split raw MJPEG streams
+SOI = b"\xff\xd8"
+EOI = b"\xff\xd9"
+
+
+def mjpeg_frames(path):
+    # Raw MJPEG is just concatenated JPEGs
+    with open(path, "rb") as f:
+        data = f.read()
+    pos = 0
+    while True:
+        start = data.find(SOI, pos)
+        if start < 0:
+            return
+        end = data.find(EOI, start + 2)
+        if end < 0:
+            return
+        pos = end + 2
+        yield Image.open(io.BytesIO(data[start:pos])), None
+
+
+def image_frames(path):
+    # GIF / APNG / anything else Pillow can seek through; durations in seconds
+    with Image.open(path) as image:
+        for frame in ImageSequence.Iterator(image):
+            duration = frame.info.get("duration")
+            yield frame.copy(), duration / 1000 if duration else None
+
+
+class Player:
+    """Plays an animation through a Display with decode-ahead.
+
+    A worker decodes frames, fits them to the panel and converts them to RGB565
+    in batches, feeding a bounded queue. The caller's thread sends them on a
+    fixed clock, dropping frames whose slot has passed when SPI falls behind.
+    """
+
+    def __init__(self, display, source, fps=None, queue_size=8, batch=4,
+                 policy="letterbox", loops=1):
+        self.display = display
+        self.source = source
+        self.fps = fps
+        self.batch = batch
+        self.policy = policy
+        self.loops = loops
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+
+        # Accumulated seconds per stage
+        self.timing = {"decode": 0.0, "resize": 0.0, "convert": 0.0, "send": 0.0}
+        self.decoded = 0
+        self.shown = 0
+        self.dropped = 0
+        self.elapsed = 0.0
+
+    def _open(self):
+        if self.source.lower().endswith((".mjpeg", ".mjpg")):
+            return mjpeg_frames(self.source)
+        return image_frames(self.source)
+
+    def _flush(self, images, durations):
+        t = time.perf_counter()
+        bufs = pack_rgb565(np.stack(images))
+        self.timing["convert"] += time.perf_counter() - t
+        for buf, duration in zip(bufs, durations):
+            self._put((buf, duration))
+
+    def _put(self, item):
+        # Blocks while the queue is full, which is what bounds decode-ahead
+        while not self._stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _decode(self):
+        size = (self.display.disp.width, self.display.disp.height)
+        try:
+            for _ in range(self.loops):
+                images, durations = [], []
+                frames = self._open()
+                while not self._stop.is_set():
+                    t = time.perf_counter()
+                    item = next(frames, None)
+                    if item is None:
+                        break
+                    image, duration = item
+                    image.draft("RGB", size)
+                    image.load()
+                    t2 = time.perf_counter()
+                    self.timing["decode"] += t2 - t
+                    images.append(np.asarray(fit_image(image, size, self.policy)))
+                    durations.append(duration)
+                    self.timing["resize"] += time.perf_counter() - t2
+                    self.decoded += 1
+                    if len(images) == self.batch:
+                        self._flush(images, durations)
+                        images, durations = [], []
+                if images:
+                    self._flush(images, durations)
+        except Exception:
+            logging.exception(f"Decoding {self.source} failed.")
+        finally:
+            self._put(None)
+
+    def stop(self):
+        self._stop.set()
+
+    def play(self):
+        worker = threading.Thread(target=self._decode, name="player-decode", daemon=True)
+        worker.start()
+        start = time.monotonic()
+        due = start
+        while not self._stop.is_set():
+            # Polled like _put, so stop() also ends a wait for the decoder
+            try:
+                item = self.queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is None:
+                break
+            buf, duration = item
+            interval = 1.0 / self.fps if self.fps else (duration or 0.1)
+            now = time.monotonic()
+            if now > due + interval and not self.queue.empty():
+                # Already a whole frame behind: skip this one to catch up
+                self.dropped += 1
+            else:
+                if due > now and self._stop.wait(due - now):
+                    break
+                t = time.perf_counter()
+                self.display.show_frame(buf)
+                self.timing["send"] += time.perf_counter() - t
+                self.shown += 1
+            due += interval
+        self.elapsed = time.monotonic() - start
+        self._stop.set()
+        worker.join(timeout=1.0)
+        return self.stats()
+
+    def stats(self):
+        per_frame = {stage: (seconds / self.decoded if self.decoded else 0.0)
+                     for stage, seconds in self.timing.items() if stage != "send"}
+        per_frame["send"] = self.timing["send"] / self.shown if self.shown else 0.0
+        return {
+            "frames": self.decoded,
+            "shown": self.shown,
+            "dropped": self.dropped,
+            "fps": self.shown / self.elapsed if self.elapsed else 0.0,
+            "seconds": self.elapsed,
+            "per_frame": per_frame,
+        }
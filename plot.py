@@ -1,8 +1,11 @@
 import pandas as pd
-import plotly.graph_objects as go
 import time
 from disp_manager import Display
 from PIL import Image
+from asset_cache import fit_image
+from chart import render_history
+from tsstore import open_store
+from smoothing import smooth
 from datetime import timedelta
 
 # Define the margin as a percentage (e.g., 10%)
@@ -19,7 +22,7 @@ def resize_image_to_display(image_path, output_path):
     img = Image.open(image_path)
 
     # Resize the image to the display size (240x135)
-    img_resized = img.resize((240, 135), Image.Resampling.LANCZOS)
+    img_resized = fit_image(img, (240, 135), "stretch")
 
     # Save the resized image
     img_resized.save(output_path)
@@ -30,13 +33,21 @@ def wait(sec: float = 4):
 
 
 def plot_scatter(df, scaled=True, last_n_hours=None, smoothing=0):
+    # Full-size plotly figure; only needed for the desktop preview and PNG export
+    import plotly.graph_objects as go
+
     # Convert 'Timestamp' to datetime if it's not already
     df['Timestamp'] = pd.to_datetime(df['Timestamp'])
 
     # Filter data for the last 'n' hours if specified
     if last_n_hours is not None:
-        time_threshold = df['Timestamp'].max() - timedelta(hours=last_n_hours)
-        df = df[df['Timestamp'] >= time_threshold]
+        if df['Timestamp'].is_monotonic_increasing:
+            # Time-ordered log: binary search instead of a mask over every row
+            time_threshold = df['Timestamp'].iloc[-1] - timedelta(hours=last_n_hours)
+            df = df.iloc[df['Timestamp'].searchsorted(time_threshold):]
+        else:
+            time_threshold = df['Timestamp'].max() - timedelta(hours=last_n_hours)
+            df = df[df['Timestamp'] >= time_threshold]
 
     # Calculate dynamic range for temperature and moisture
     temp_min = df['Temp'].min()
@@ -60,6 +71,11 @@ def plot_scatter(df, scaled=True, last_n_hours=None, smoothing=0):
     temp_min = max(temp_min, 0)
     moist_min = max(moist_min, 0)
 
+    # Smooth the data itself; the ranges above stay those of the raw readings
+    if smoothing:
+        df = df.assign(Temp=smooth(df['Temp'].to_numpy(), smoothing),
+                       Moist=smooth(df['Moist'].to_numpy(), smoothing))
+
     # Create the base figure
     fig = go.Figure()
 
@@ -148,18 +164,16 @@ def plot_scatter(df, scaled=True, last_n_hours=None, smoothing=0):
 
 
 def show_on_display(image_path, d: Display):
-    # Open the image
-    image = Image.open(image_path)
-
-    # Display it using the Display class
-    d.disp.ShowImage(image.convert("RGB"))
+    # Display it using the Display class and its asset cache
+    d.show_on_display(image_path)
 
 
 def main():
-    df = pd.read_csv("garden_data_cleaned.csv")
+    store = open_store()
 
-    # Call plot_scatter with the last 12 hours of data, dynamic axis scaling, and smoothing level 2
-    plot_scatter(df, scaled=True, last_n_hours=12, smoothing=2)
+    # Last 12 hours of data with dynamic axis scaling and smoothing level 2
+    d = Display()
+    d.show_frame(render_history(store, 12, scaled=True, smoothing=2))
     wait(10)
 
 
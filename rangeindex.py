@@ -0,0 +1,117 @@
+from collections import namedtuple
+
+import numpy as np
+
+# Summary of one series over a row range
+RangeStats = namedtuple("RangeStats", "count min max mean")
+
+# Children per node of the min/max tree; partial nodes at the edges of a
+# query are scanned with one NumPy call per level
+FANOUT = 64
+
+
+class _Growable:
+    # Array with amortized O(1) append
+    def __init__(self, values, dtype):
+        values = np.asarray(values, dtype=dtype)
+        self.n = len(values)
+        self.data = np.empty(max(16, 2 * self.n), dtype=dtype)
+        self.data[:self.n] = values
+
+    def __len__(self):
+        return self.n
+
+    def view(self):
+        return self.data[:self.n]
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.data.dtype)
+        if self.n + len(values) > len(self.data):
+            grown = np.empty(max(2 * len(self.data), self.n + len(values)), dtype=self.data.dtype)
+            grown[:self.n] = self.data[:self.n]
+            self.data = grown
+        self.data[self.n:self.n + len(values)] = values
+        self.n += len(values)
+
+
+def _reduce(values, ufunc):
+    # One tree level up: ufunc over each run of FANOUT values
+    return ufunc.reduceat(values, np.arange(0, len(values), FANOUT)) if len(values) else values[:0]
+
+
+class SeriesIndex:
+    """Block sums and a FANOUT-ary min/max tree over one append-only series.
+
+    The raw values stay in the store; the index holds about 1/FANOUT of their
+    size. count is O(1), mean is a prefix-sum difference plus at most two
+    partial blocks, and min / max walk the tree in O(log n) levels. update()
+    folds in appended rows by rebuilding one node per level.
+    """
+
+    def __init__(self, values):
+        self.n = 0
+        self.prefix = _Growable([0.0], np.float64)  # prefix sums of whole blocks
+        self.mins, self.maxs = [], []
+        self.update(values)
+
+    def __len__(self):
+        return self.n
+
+    def update(self, values):
+        # `values` is the whole current column; rows past self.n are new
+        if len(values) <= self.n:
+            return
+        first = self.n // FANOUT
+        tail = np.asarray(values[first * FANOUT:], dtype=np.float64)
+        block_sums = _reduce(tail, np.add)
+        self.prefix.n = first + 1
+        self.prefix.extend(self.prefix.data[first] + np.cumsum(block_sums))
+        # Rebuild only the touched tail of every level
+        below_min = below_max = tail
+        level = 0
+        while first * FANOUT + len(below_min) > FANOUT or level < len(self.mins):
+            if level == len(self.mins):
+                self.mins.append(_Growable([], np.float64))
+                self.maxs.append(_Growable([], np.float64))
+            mins, maxs = self.mins[level], self.maxs[level]
+            mins.n = maxs.n = first
+            mins.extend(_reduce(below_min, np.minimum))
+            maxs.extend(_reduce(below_max, np.maximum))
+            # The next level up recomputes from its first touched node
+            parent = first // FANOUT
+            below_min = mins.view()[parent * FANOUT:]
+            below_max = maxs.view()[parent * FANOUT:]
+            first = parent
+            level += 1
+        self.n = len(values)
+
+    def _extreme(self, values, lo, hi, reduce, levels):
+        best = []
+        for level in range(len(levels) + 1):
+            a = -(-lo // FANOUT) * FANOUT
+            b = hi // FANOUT * FANOUT
+            if level == len(levels) or b - a < FANOUT:
+                best.append(reduce(values[lo:hi]))
+                break
+            if lo < a:
+                best.append(reduce(values[lo:a]))
+            if b < hi:
+                best.append(reduce(values[b:hi]))
+            lo, hi = a // FANOUT, b // FANOUT
+            values = levels[level].view()
+        return reduce(best)
+
+    def stats(self, values, lo, hi):
+        # Rows [lo, hi) of `values`, the column this index was built over
+        count = hi - lo
+        if count <= 0:
+            return RangeStats(0, np.nan, np.nan, np.nan)
+        a = min(-(-lo // FANOUT) * FANOUT, hi)
+        b = max(hi // FANOUT * FANOUT, a)
+        prefix = self.prefix.data
+        total = (prefix[b // FANOUT] - prefix[a // FANOUT]
+                 + np.sum(values[lo:a], dtype=np.float64) + np.sum(values[b:hi], dtype=np.float64))
+        return RangeStats(count,
+                          float(self._extreme(values, lo, hi, np.min, self.mins)),
+                          float(self._extreme(values, lo, hi, np.max, self.maxs)),
+                          float(total / count))
@@ -0,0 +1,194 @@
+import os
+import logging
+
+import numpy as np
+
+# Bucket sizes kept for every store, finest first
+RESOLUTIONS = (("minute", 60), ("hour", 3600), ("day", 86400))
+
+SERIES = ("temp", "moist")
+
+# One record per bucket: start time, sample count and per series the
+# min / max / sum / last value. Mean is sum / count.
+ROLLUP_DTYPE = np.dtype([("ts", "<i8"), ("count", "<u4")] + [
+    (f"{name}_{field}", dtype) for name in SERIES
+    for field, dtype in (("min", "<f4"), ("max", "<f4"), ("sum", "<f8"), ("last", "<f4"))])
+
+
+def aggregate(ts, columns, seconds):
+    # Vectorized: ts is sorted, so buckets are contiguous runs for reduceat
+    ts = np.asarray(ts, dtype=np.int64)
+    buckets = ts // seconds * seconds
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    out = np.empty(len(starts), dtype=ROLLUP_DTYPE)
+    out["ts"] = buckets[starts]
+    out["count"] = np.diff(np.r_[starts, len(ts)])
+    ends = np.r_[starts[1:], len(ts)] - 1
+    for name in SERIES:
+        values = np.asarray(columns[name])
+        out[f"{name}_min"] = np.minimum.reduceat(values, starts)
+        out[f"{name}_max"] = np.maximum.reduceat(values, starts)
+        out[f"{name}_sum"] = np.add.reduceat(values.astype(np.float64), starts)
+        out[f"{name}_last"] = values[ends]
+    return out
+
+
+def merge(a, b):
+    # Combine two records of the same bucket, b being the later one
+    out = a.copy()
+    out["count"] = a["count"] + b["count"]
+    for name in SERIES:
+        out[f"{name}_min"] = min(a[f"{name}_min"], b[f"{name}_min"])
+        out[f"{name}_max"] = max(a[f"{name}_max"], b[f"{name}_max"])
+        out[f"{name}_sum"] = a[f"{name}_sum"] + b[f"{name}_sum"]
+        out[f"{name}_last"] = b[f"{name}_last"]
+    return out
+
+
+def mean(buckets, name):
+    return buckets[f"{name}_sum"] / np.maximum(buckets["count"], 1)
+
+
+class Rollup:
+    """Aggregates of one store at one bucket size.
+
+    Closed buckets are appended to a file next to the raw columns; the bucket
+    still filling up lives in memory and is rebuilt from the raw rows on open.
+    """
+
+    def __init__(self, path, name, seconds):
+        self.name = name
+        self.seconds = seconds
+        self.path = os.path.join(path, f"rollup_{name}.bin")
+        self._file = open(self.path, "ab")
+        self._repaired = False
+        self.sync()
+        # Closed buckets not in the file yet, rebuilt from raw rows; only the
+        # process that appends readings writes them out
+        self.pending = np.empty(0, ROLLUP_DTYPE)
+        self.open = None  # the current, not yet closed bucket
+
+    def _repair(self):
+        # A crash mid-write leaves a partial record; only the process that
+        # appends drops it, since for a reader it may be a write in progress
+        size = os.path.getsize(self.path)
+        if size % ROLLUP_DTYPE.itemsize:
+            logging.warning(f"Truncating {self.path} to whole records.")
+            os.truncate(self.path, size - size % ROLLUP_DTYPE.itemsize)
+        self._repaired = True
+
+    def sync(self):
+        # Re-read the closed bucket count, picking up another process's appends
+        self._rows = os.path.getsize(self.path) // ROLLUP_DTYPE.itemsize
+        self._view = None
+
+    @property
+    def closed(self):
+        # Zero-copy view of every closed bucket
+        if self._view is None:
+            self._view = (np.memmap(self.path, dtype=ROLLUP_DTYPE, mode="r", shape=(self._rows,))
+                          if self._rows else np.empty(0, ROLLUP_DTYPE))
+        return self._view
+
+    def covered_until(self):
+        # Raw readings before this time are already in closed buckets
+        return int(self.closed["ts"][-1]) + self.seconds if self._rows else None
+
+    def rebuild(self, ts, columns):
+        # In-memory buckets from the raw rows past covered_until(); nothing is
+        # written, so readers of a store never touch the file
+        self.open = None
+        self.pending = np.empty(0, ROLLUP_DTYPE)
+        if len(ts):
+            buckets = aggregate(ts, columns, self.seconds)
+            self.pending = buckets[:-1]
+            self.open = buckets[-1].copy()
+
+    def extend(self, ts, columns):
+        # New readings from this process; closed buckets go to the file
+        if len(ts) == 0:
+            return
+        if len(ts) == 1 and self.open is not None and ts[0] // self.seconds * self.seconds == self.open["ts"]:
+            # The common case, one reading into the open bucket
+            self.open["count"] += 1
+            for name in SERIES:
+                value = columns[name][0]
+                self.open[f"{name}_min"] = min(self.open[f"{name}_min"], value)
+                self.open[f"{name}_max"] = max(self.open[f"{name}_max"], value)
+                self.open[f"{name}_sum"] += value
+                self.open[f"{name}_last"] = value
+            return
+        new = aggregate(ts, columns, self.seconds)
+        if self.open is not None:
+            if new["ts"][0] == self.open["ts"]:
+                new[0] = merge(self.open, new[0])
+            else:
+                new = np.r_[np.array([self.open], dtype=ROLLUP_DTYPE), new]
+        new = np.r_[self.pending, new]
+        self.pending = self.pending[:0]
+        if len(new) > 1:
+            if not self._repaired:
+                self._repair()
+            self._file.write(new[:-1].tobytes())
+            self._file.flush()
+            self._rows += len(new) - 1
+            self._view = None
+        self.open = new[-1].copy()
+
+    def window(self, start, end):
+        # Buckets starting in [start, end), the open one included
+        closed = self.closed
+        first = start // self.seconds * self.seconds
+        lo = int(np.searchsorted(closed["ts"], first))
+        hi = int(np.searchsorted(closed["ts"], end))
+        tail = self.pending
+        if self.open is not None:
+            tail = np.r_[tail, np.array([self.open], dtype=ROLLUP_DTYPE)]
+        tail = tail[(tail["ts"] >= first) & (tail["ts"] < end)]
+        return np.r_[closed[lo:hi], tail] if len(tail) else closed[lo:hi]
+
+    def close(self):
+        self._view = None
+        self._file.close()
+
+
+class Rollups:
+    """Per-minute, per-hour and per-day rollups kept in step with a store."""
+
+    def __init__(self, store, resolutions=RESOLUTIONS):
+        self.store = store
+        self.levels = [Rollup(store.path, name, seconds) for name, seconds in resolutions]
+        self.refresh()
+
+    def _catch_up(self, level):
+        # Rebuild what the file doesn't cover yet (the open bucket after a
+        # restart, or rows another process appended) in memory only: the
+        # process that appends is the one that writes closed buckets out
+        level.sync()
+        start = level.covered_until()
+        window = self.store.window(start) if start is not None else self.store.window()
+        level.rebuild(window.ts, {"temp": window.temp, "moist": window.moist})
+
+    def refresh(self):
+        for level in self.levels:
+            self._catch_up(level)
+
+    def extend(self, ts, temp, moist):
+        for level in self.levels:
+            level.extend(ts, {"temp": temp, "moist": moist})
+
+    def select(self, start, end, columns):
+        # Coarsest rollup that still gives every pixel column a bucket, or None
+        # when only raw readings are fine enough. Judged on the span the
+        # readings cover, not the requested one, so a window reaching back
+        # before the first reading doesn't pick a level that's too coarse
+        if len(self.store):
+            start = max(start, int(self.store.ts[0]))
+        for level in reversed(self.levels):
+            if (end - start) / level.seconds >= columns:
+                return level
+        return None
+
+    def close(self):
+        for level in self.levels:
+            level.close()
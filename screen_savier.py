@@ -1,16 +1,25 @@
-from disp_manager import Display
-from plot import plot_scatter
-import time
-import pandas as pd
+from disp_manager import Display, Carousel
+from chart import ChartCache
+from tsstore import open_store
 
 
 d = Display()
 
 
-df = pd.read_csv("garden_data_cleaned.csv")
-d.show_on_display(plot_scatter(df, scaled=True, last_n_hours=12, smoothing=2))
-time.sleep(10)
-d.show_text("Temp: 25°C")
-time.sleep(10)
-d.show_text("Moist: 55%")
-time.sleep(10)
+store = open_store()
+
+# The plot page is only re-rendered when new readings have arrived
+charts = ChartCache(store)
+
+
+def plot_page():
+    # Only the last 12 hours are touched, however long the history is
+    return charts.get(12, scaled=True, smoothing=2)
+
+
+# Each page renders in the background just before its slot comes up
+carousel = Carousel(d, transition="crossfade")
+carousel.add("plot", plot_page, 10)
+carousel.add("temp", lambda: d.render_text("Temp: 25°C"), 10)
+carousel.add("moist", lambda: d.render_text("Moist: 55%"), 10)
+carousel.run()
@@ -0,0 +1,151 @@
+import bisect
+from collections import deque
+
+import numpy as np
+
+# Every filter comes twice: a vectorized function over a whole window, and a
+# class whose update() takes one new sample and returns the filtered value in
+# constant time for a fixed window. Both are causal (only past samples) and
+# agree sample for sample; the centered=True variants, which charts use, are
+# vectorized only.
+
+
+def ema(values, alpha):
+    # Exponential moving average, y[i] = y[i-1] + alpha * (x[i] - y[i-1]),
+    # solved in closed form per block so the inner loop is NumPy
+    if not 0 < alpha <= 1:
+        raise ValueError(f"EMA alpha must be in (0, 1], got {alpha}.")
+    x = np.asarray(values, dtype=np.float64)
+    if len(x) == 0 or alpha == 1:
+        return x.copy()
+    decay = 1.0 - alpha
+    # Keep decay ** -block well inside float64 range
+    block = max(1, min(len(x), int(150 / -np.log10(decay))))
+    powers = decay ** np.arange(1, block + 1)
+    out = np.empty_like(x)
+    y = x[0]
+    for start in range(0, len(x), block):
+        chunk = x[start:start + block]
+        p = powers[:len(chunk)]
+        out[start:start + len(chunk)] = p * (y + alpha * np.cumsum(chunk / p))
+        y = out[start + len(chunk) - 1]
+    return out
+
+
+def rolling_mean(values, window):
+    # Mean of the last `window` samples (fewer at the start)
+    x = np.asarray(values, dtype=np.float64)
+    sums = np.cumsum(np.r_[0.0, x])
+    idx = np.arange(1, len(x) + 1)
+    lo = np.maximum(idx - window, 0)
+    return (sums[idx] - sums[lo]) / (idx - lo)
+
+
+def rolling_median(values, window, centered=False):
+    # Median of the last `window` samples (fewer at the start). Centered: of
+    # the `window` samples around each one (fewer at the ends), which doesn't
+    # lag the series
+    x = np.asarray(values, dtype=np.float64)
+    n = len(x)
+    first = window // 2 if centered else window - 1
+
+    def partial(i):
+        return np.median(x[max(0, i - first):i - first + window])
+
+    if n < window:
+        return np.array([partial(i) for i in range(n)])
+    out = np.empty_like(x)
+    out[first:n - window + first + 1] = np.median(np.lib.stride_tricks.sliding_window_view(x, window), axis=1)
+    for i in [*range(first), *range(n - window + first + 1, n)]:
+        out[i] = partial(i)
+    return out
+
+
+def savgol_coeffs(window, order, pos):
+    # Weights that fit a polynomial of `order` to `window` samples by least
+    # squares and evaluate it at sample `pos` of the window
+    t = np.arange(window, dtype=np.float64) - pos
+    return np.linalg.pinv(np.vander(t, order + 1, increasing=True))[0]
+
+
+def savgol(values, window=11, order=2, centered=False):
+    # Savitzky-Golay smoothing. Causal: the fit over the last `window` samples
+    # evaluated at the newest one; the first window - 1 samples pass through.
+    # Centered: evaluated mid-window, with shifted fits at both ends.
+    x = np.asarray(values, dtype=np.float64)
+    if len(x) < window:
+        return x.copy()
+    frames = np.lib.stride_tricks.sliding_window_view(x, window)
+    if not centered:
+        return np.r_[x[:window - 1], frames @ savgol_coeffs(window, order, window - 1)]
+    half = window // 2
+    out = np.empty_like(x)
+    out[half:len(x) - window + half + 1] = frames @ savgol_coeffs(window, order, half)
+    for i in range(half):
+        out[i] = x[:window] @ savgol_coeffs(window, order, i)
+        out[len(x) - half + i] = x[-window:] @ savgol_coeffs(window, order, window - half + i)
+    return out
+
+
+class Ema:
+    def __init__(self, alpha):
+        if not 0 < alpha <= 1:
+            raise ValueError(f"EMA alpha must be in (0, 1], got {alpha}.")
+        self.alpha = alpha
+        self.value = None
+
+    def update(self, x):
+        self.value = x if self.value is None else self.value + self.alpha * (x - self.value)
+        return self.value
+
+
+class RollingMean:
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.total = 0.0
+
+    def update(self, x):
+        if len(self.samples) == self.samples.maxlen:
+            self.total -= self.samples[0]
+        self.samples.append(x)
+        self.total += x
+        return self.total / len(self.samples)
+
+
+class RollingMedian:
+    # Sorted copy of the window kept with bisect; windows here are a handful
+    # of samples, so the insert / remove shifts are negligible
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.sorted = []
+
+    def update(self, x):
+        if len(self.samples) == self.samples.maxlen:
+            del self.sorted[bisect.bisect_left(self.sorted, self.samples[0])]
+        self.samples.append(x)
+        bisect.insort(self.sorted, x)
+        n = len(self.sorted)
+        return self.sorted[n // 2] if n % 2 else (self.sorted[n // 2 - 1] + self.sorted[n // 2]) / 2
+
+
+class SavGol:
+    # Causal Savitzky-Golay: one dot product of fixed length per sample
+    def __init__(self, window=11, order=2):
+        self.samples = deque(maxlen=window)
+        self.coeffs = savgol_coeffs(window, order, window - 1)
+
+    def update(self, x):
+        self.samples.append(x)
+        if len(self.samples) < self.samples.maxlen:
+            return x
+        return float(np.dot(self.coeffs, self.samples))
+
+
+def smooth(values, level):
+    # Chart smoothing levels: 0 raw, 1 light Savitzky-Golay, 2 median to drop
+    # spikes and then a wider Savitzky-Golay. Both centered, so lines don't lag
+    if level <= 0:
+        return np.asarray(values, dtype=np.float64)
+    if level == 1:
+        return savgol(values, window=7, order=2, centered=True)
+    return savgol(rolling_median(values, 5, centered=True), window=15, order=2, centered=True)
@@ -0,0 +1,215 @@
+import os
+import json
+import string
+from dataclasses import dataclass, field, fields
+
+import numpy as np
+from PIL import Image
+
+from asset_cache import fit_image
+from framebuffer import FrameBuffer
+from text_layout import draw_layout, layout_text
+
+try:
+    import yaml
+except ImportError:
+    # YAML templates are optional; JSON and Python dataclasses always work
+    yaml = None
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def _font_path(name):
+    return name if os.path.isabs(name) else os.path.join(current_dir, 'Font', name)
+
+
+def _bindings(text):
+    # Names used as {placeholders} in a format string
+    return {name.split(".")[0].split("[")[0]
+            for _, name, _, _ in string.Formatter().parse(text) if name}
+
+
+# Screen elements. Anything without a data binding is static and gets drawn
+# into the plan's base frame once at compile time.
+
+@dataclass
+class Rect:
+    box: tuple
+    color: object = "WHITE"
+    outline: object = None
+
+
+@dataclass
+class Gradient:
+    box: tuple
+    start_color: object = (0, 0, 0)
+    end_color: object = (255, 255, 255)
+
+
+@dataclass
+class Line:
+    start: tuple
+    end: tuple
+    color: object = "WHITE"
+    width: int = 1
+
+
+@dataclass
+class Text:
+    box: tuple
+    text: str = ""  # may contain {name} bindings, e.g. "Temp: {temp:.1f}°C"
+    font: str = "OrbitronM.ttf"
+    size: int = 22  # largest size tried when fitting the box
+    min_size: int = 8
+    color: object = "WHITE"
+    align: str = "center"
+    valign: str = "middle"
+
+
+@dataclass
+class Picture:
+    box: tuple
+    path: str = ""
+    policy: str = "letterbox"
+
+
+@dataclass
+class Marker:
+    # Horizontal dash whose height tracks a bound value, e.g. a level on a bar
+    bind: str
+    x: tuple  # (left, right)
+    y: tuple  # (y at `high`, y at `low`)
+    low: float = 0
+    high: float = 100
+    color: object = "WHITE"
+    width: int = 1
+
+
+@dataclass
+class Screen:
+    width: int = 240
+    height: int = 135
+    background: object = (39, 39, 39)
+    elements: list = field(default_factory=list)
+
+
+ELEMENT_TYPES = {cls.__name__.lower(): cls for cls in (Rect, Gradient, Line, Text, Picture, Marker)}
+
+
+def screen_from_dict(data):
+    # {"width": .., "background": .., "elements": [{"type": "text", ...}, ...]}
+    elements = []
+    for item in data.get("elements", []):
+        item = dict(item)
+        cls = ELEMENT_TYPES[item.pop("type")]
+        names = {f.name for f in fields(cls)}
+        elements.append(cls(**{k: tuple(v) if isinstance(v, list) else v
+                               for k, v in item.items() if k in names}))
+    background = data.get("background", Screen.background)
+    return Screen(data.get("width", 240), data.get("height", 135),
+                  tuple(background) if isinstance(background, list) else background, elements)
+
+
+def load_screen(path):
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise ImportError("PyYAML is needed for YAML screen templates.")
+            return screen_from_dict(yaml.safe_load(f))
+        return screen_from_dict(json.load(f))
+
+
+class RenderPlan:
+    """A Screen compiled once: static elements baked into a base frame, and
+    the dynamic ones reduced to draw calls over precomputed regions."""
+
+    def __init__(self, screen, atlas=None):
+        self.screen = screen
+        self.atlas = atlas
+        self.base = FrameBuffer(screen.width, screen.height, screen.background)
+        self.dynamic = []  # (element, region (x, y, w, h), bindings)
+        self._last = None
+
+        for element in screen.elements:
+            bindings = self._element_bindings(element)
+            if bindings:
+                self.dynamic.append((element, self._region(element), bindings))
+            else:
+                self._draw(self.base, element, {})
+
+    @staticmethod
+    def _element_bindings(element):
+        if isinstance(element, Text):
+            return _bindings(element.text)
+        if isinstance(element, Marker):
+            return {element.bind}
+        return set()
+
+    def _region(self, element):
+        # Every pixel a dynamic element may touch, clipped to the screen
+        if isinstance(element, Marker):
+            top = min(element.y) - element.width // 2 - 1
+            bottom = max(element.y) + element.width // 2 + 2
+            x0, y0, x1, y1 = min(element.x), top, max(element.x) + 1, bottom
+        else:
+            x, y, w, h = element.box
+            x0, y0, x1, y1 = x, y, x + w, y + h
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(self.screen.width, x1), min(self.screen.height, y1)
+        return x0, y0, x1 - x0, y1 - y0
+
+    def _draw(self, frame, element, data):
+        if isinstance(element, Rect):
+            x, y, w, h = element.box
+            frame.fill_rect(x, y, w, h, element.color)
+            if element.outline is not None:
+                frame.rect(x, y, w, h, element.outline)
+        elif isinstance(element, Gradient):
+            frame.bar(*element.box, element.start_color, element.end_color)
+        elif isinstance(element, Line):
+            frame.line(*element.start, *element.end, element.color, width=element.width)
+        elif isinstance(element, Text):
+            text = element.text.format(**data) if data else element.text
+            layout = layout_text(text, tuple(element.box), _font_path(element.font),
+                                 max_size=element.size, min_size=element.min_size,
+                                 align=element.align, valign=element.valign, atlas=self.atlas)
+            draw_layout(frame, layout, element.color, self.atlas)
+        elif isinstance(element, Picture):
+            x, y, w, h = element.box
+            with Image.open(element.path) as image:
+                frame.blit(FrameBuffer.from_image(fit_image(image, (w, h), element.policy)), x, y)
+        elif isinstance(element, Marker):
+            value = min(max(float(data[element.bind]), element.low), element.high)
+            top, bottom = element.y
+            y = top + (element.high - value) * (bottom - top) // (element.high - element.low)
+            frame.line(element.x[0], y, element.x[1], y, element.color, width=element.width)
+
+    def render(self, data):
+        frame = self.base.copy()
+        for element, _, _ in self.dynamic:
+            self._draw(frame, element, data)
+        return frame
+
+    def update(self, display, data):
+        # Send only the dynamic regions whose pixels changed since the last update
+        frame = self.render(data)
+        if self._last is None or not np.array_equal(display.fb.buf, self._last.buf):
+            # First update, or something else drew on the panel since
+            display.show_frame(frame)
+        else:
+            for _, (x, y, w, h), _ in self.dynamic:
+                new = frame.buf[y:y + h, x:x + w]
+                if not np.array_equal(new, self._last.buf[y:y + h, x:x + w]):
+                    display.show_window(x, y, new.copy())
+        self._last = frame
+        return frame
+
+
+# The moisture dashboard from Display.show_moisture_with_text as a template
+MOISTURE_SCREEN = Screen(elements=[
+    Gradient((210, 5, 21, 125), (22, 98, 125), (125, 140, 139)),
+    Line((210, 80), (230, 80), "WHITE", 2),    # top of the 20-40% optimal range
+    Line((210, 105), (230, 105), "WHITE", 2),  # bottom of the optimal range
+    Marker("level", x=(195, 230), y=(5, 130), color=(169, 191, 4), width=3),
+    Text((10, 5, 180, 125), "{text}", font="OrbitronSB.ttf", size=18, align="left"),
+])
@@ -1,4 +1,6 @@
 from PIL import Image, ImageDraw, ImageFont
+from framebuffer import FrameBuffer
+from emoji_atlas import EmojiAtlas
 
 class MockLCD:
     def __init__(self):
@@ -32,16 +34,16 @@ if __name__ == "__main__":
         disp.clear()
         disp.bl_DutyCycle(50)
 
-        # Create blank image for drawing
+        # Create blank frame for drawing
         Font = ImageFont.load_default()
+        emoji = EmojiAtlas(cell=16)
 
-        image = Image.new("RGB", (disp.width, disp.height), "WHITE")
-        draw = ImageDraw.Draw(image)
+        frame = FrameBuffer(disp.width, disp.height, "WHITE")
 
-        # Draw text with emojis
+        # Draw text with emojis, the emoji come from the atlas
         text = "Hello World! 😊🌍"
-        draw.text((10, 10), text, font=Font, fill="BLACK")
-        disp.ShowImage(image)
+        frame.text((10, 10), text, Font, "BLACK", emoji)
+        disp.ShowImage(frame.to_image())
 
         input("Press Enter to continue...")
 
@@ -0,0 +1,43 @@
+import tempfile
+
+import numpy as np
+
+from rollups import aggregate
+from tsstore import SeriesStore
+
+
+def test_reader_refresh_leaves_rollups_intact():
+    # One process appends while another refreshes the same store: the reader
+    # must not write buckets of its own, and both see the batch rollups
+    with tempfile.TemporaryDirectory() as path:
+        writer = SeriesStore(path)
+        reader = SeriesStore(path)
+        ts = 1_700_000_000 + 60 * np.arange(20)
+        temp = np.linspace(10, 20, 20, dtype=np.float32)
+        moist = np.linspace(30, 40, 20, dtype=np.float32)
+        for i in range(20):
+            writer.append(ts[i], temp[i], moist[i])
+            if i in (7, 13):
+                reader.refresh()
+        reader.refresh()
+
+        expected = aggregate(ts, {"temp": temp, "moist": moist}, 60)
+        for store in (writer, reader):
+            level = store.rollups.levels[0]
+            buckets = level.window(int(ts[0]), int(ts[-1]) + 1)
+            assert np.array_equal(buckets, expected)
+            assert np.all(np.diff(level.closed["ts"]) > 0)
+        assert len(writer.rollups.levels[0].closed) == 19
+        writer.close()
+        reader.close()
+
+        # Reopened, every raw row is counted exactly once
+        store = SeriesStore(path)
+        for level in store.rollups.levels:
+            assert level.window(int(ts[0]), int(ts[-1]) + 1)["count"].sum() == 20
+        store.close()
+
+
+if __name__ == "__main__":
+    test_reader_refresh_leaves_rollups_intact()
+    print("OK")
@@ -0,0 +1,130 @@
+import os
+import logging
+from functools import lru_cache
+from collections import namedtuple
+
+from PIL import ImageFont
+
+from framebuffer import SKIP_CODEPOINTS
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FONT = os.path.join(current_dir, 'Font', 'OrbitronM.ttf')
+
+# Result of fitting text into a box: the chosen font size, the wrapped lines and
+# the top-left corner of each line in display coordinates
+TextLayout = namedtuple("TextLayout", "size lines positions font")
+
+
+@lru_cache(maxsize=64)
+def get_font(path, size):
+    try:
+        return ImageFont.truetype(path, size)
+    except IOError:
+        logging.warning(f"Font {path} not found, using default font.")
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=8192)
+def text_width(path, size, text, atlas=None):
+    # Advance width of a word or line; words repeat a lot between refreshes.
+    # With an emoji atlas, measured the way FrameBuffer.text draws it: each
+    # atlas glyph is atlas.cell + 1 px and joiners / variation selectors are
+    # skipped, with the font measuring the plain runs in between
+    font = get_font(path, size)
+    if atlas is None or not any(ch in atlas for ch in text):
+        return font.getlength(text)
+    width, run = 0, ""
+    for ch in text:
+        if ord(ch) in SKIP_CODEPOINTS:
+            continue
+        if ch not in atlas:
+            run += ch
+            continue
+        if run:
+            width += int(font.getlength(run))
+            run = ""
+        width += atlas.cell + 1
+    return width + (font.getlength(run) if run else 0)
+
+
+@lru_cache(maxsize=256)
+def line_height(path, size, spacing):
+    ascent, descent = get_font(path, size).getmetrics()
+    return ascent + descent + round(size * spacing)
+
+
+def wrap(text, path, size, max_width, atlas=None):
+    # Greedy word wrap that keeps explicit newlines and runs of spaces, and
+    # splits words too long for a line on their own
+    space = text_width(path, size, " ")
+    lines = []
+    for paragraph in text.split("\n"):
+        line, width = "", 0
+        for i, word in enumerate(paragraph.rstrip().split(" ")):
+            w = text_width(path, size, word, atlas)
+            if i and width + space + w <= max_width:
+                line, width = line + " " + word, width + space + w
+                continue
+            if line:
+                lines.append(line)
+            while w > max_width and len(word) > 1:
+                cut = len(word) - 1
+                while cut > 1 and text_width(path, size, word[:cut], atlas) > max_width:
+                    cut -= 1
+                lines.append(word[:cut])
+                word = word[cut:]
+                w = text_width(path, size, word, atlas)
+            line, width = word, w
+        lines.append(line)
+    return lines
+
+
+def _fits(lines, path, size, spacing, box_w, box_h, atlas=None):
+    if len(lines) * line_height(path, size, spacing) - round(size * spacing) > box_h:
+        return False
+    return all(text_width(path, size, line, atlas) <= box_w for line in lines)
+
+
+@lru_cache(maxsize=256)
+def layout_text(text, box, font_path=DEFAULT_FONT, max_size=22, min_size=8,
+                align="center", valign="middle", spacing=0.2, atlas=None):
+    # Largest size in [min_size, max_size] whose wrapped text fits the box,
+    # found by binary search; the whole layout is memoized per argument set.
+    # Pass the atlas the text will be drawn with so emoji are measured as drawn
+    x, y, box_w, box_h = box
+    lo, hi = min_size, max_size
+    best = None
+    while lo <= hi:
+        size = (lo + hi) // 2
+        lines = wrap(text, font_path, size, box_w, atlas)
+        if _fits(lines, font_path, size, spacing, box_w, box_h, atlas):
+            best = (size, lines)
+            lo = size + 1
+        else:
+            hi = size - 1
+
+    if best is None:
+        # Even the smallest size overflows: keep the lines that fit and mark the cut
+        size = min_size
+        lines = wrap(text, font_path, size, box_w, atlas)
+        keep = max(1, (box_h + round(size * spacing)) // line_height(font_path, size, spacing))
+        if keep < len(lines):
+            lines = lines[:keep - 1] + [lines[keep - 1].rstrip() + "…"]
+        best = (size, lines)
+
+    size, lines = best
+    step = line_height(font_path, size, spacing)
+    total = len(lines) * step - round(size * spacing)
+    top = y + {"top": 0, "middle": (box_h - total) // 2, "bottom": box_h - total}[valign]
+
+    positions = []
+    for i, line in enumerate(lines):
+        w = text_width(font_path, size, line, atlas)
+        left = x + {"left": 0, "center": (box_w - w) / 2, "right": box_w - w}[align]
+        positions.append((int(left), top + i * step))
+    return TextLayout(size, tuple(lines), tuple(positions), get_font(font_path, size))
+
+
+def draw_layout(frame, layout, color, atlas=None):
+    for line, position in zip(layout.lines, layout.positions):
+        frame.text(position, line, layout.font, color, atlas)
@@ -0,0 +1,65 @@
+import numpy as np
+
+from framebuffer import RGB565, FrameBuffer, pack_rgb565, unpack_rgb565
+
+# Every transition takes the two endpoint frames and returns all n intermediate
+# frames at once as an (n, height, width) RGB565 array; the last one is `b`.
+
+
+def _steps(n):
+    return np.arange(1, n + 1, dtype=np.float32) / n
+
+
+def _buf(frame):
+    return frame.buf if isinstance(frame, FrameBuffer) else np.asarray(frame)
+
+
+def crossfade(a, b, n):
+    ta = unpack_rgb565(_buf(a)).astype(np.float32)
+    tb = unpack_rgb565(_buf(b)).astype(np.float32)
+    t = _steps(n)[:, None, None, None]
+    mixed = ta[None] + (tb - ta)[None] * t
+    return pack_rgb565(np.rint(mixed).astype(np.uint8))
+
+
+def slide(a, b, n, direction="left"):
+    # `b` pushes `a` out; one gather over the two frames laid side by side
+    a, b = _buf(a), _buf(b)
+    h, w = a.shape
+    vertical = direction in ("up", "down")
+    size = h if vertical else w
+    if direction in ("left", "up"):
+        strip = np.concatenate([a, b], axis=0 if vertical else 1)
+        offsets = np.rint(_steps(n) * size).astype(np.intp)
+    else:
+        strip = np.concatenate([b, a], axis=0 if vertical else 1)
+        offsets = size - np.rint(_steps(n) * size).astype(np.intp)
+    index = offsets[:, None] + np.arange(size)
+    if vertical:
+        return strip[index].astype(RGB565, copy=False)
+    return strip[:, index].transpose(1, 0, 2).astype(RGB565)
+
+
+def wipe(a, b, n, direction="left"):
+    # A hard edge sweeps across, revealing `b` behind it
+    a, b = _buf(a), _buf(b)
+    h, w = a.shape
+    vertical = direction in ("up", "down")
+    size = h if vertical else w
+    edge = np.rint(_steps(n) * size).astype(np.intp)[:, None]
+    pos = np.arange(size)[None, :]
+    if direction in ("left", "up"):
+        reveal = pos >= size - edge
+    else:
+        reveal = pos < edge
+    mask = reveal[:, :, None] if vertical else reveal[:, None, :]
+    return np.where(mask, b[None], a[None]).astype(RGB565, copy=False)
+
+
+TRANSITIONS = {"crossfade": crossfade, "slide": slide, "wipe": wipe}
+
+
+def transition_frames(kind, a, b, n, **options):
+    if kind not in TRANSITIONS:
+        raise ValueError(f"Unknown transition {kind!r}, expected one of {sorted(TRANSITIONS)}.")
+    return TRANSITIONS[kind](a, b, max(1, int(n)), **options)
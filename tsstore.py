@@ -0,0 +1,201 @@
+import os
+import csv
+import logging
+from collections import namedtuple
+
+import numpy as np
+
+from rangeindex import SeriesIndex
+from rollups import Rollups
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+STORE_DIR = os.path.join(current_dir, 'data', 'garden')
+CSV_PATH = os.path.join(current_dir, 'garden_data_cleaned.csv')
+
+# One append-only file per column. Timestamps are epoch seconds; the CSV has
+# naive wall-clock times, which are stored as if they were UTC so they read
+# back (and print on the charts) unchanged.
+COLUMNS = (("ts", np.dtype("<i8")), ("temp", np.dtype("<f4")), ("moist", np.dtype("<f4")))
+
+# Zero-copy slices of every column over one time range
+Window = namedtuple("Window", "ts temp moist")
+
+
+def to_seconds(ts):
+    # datetime64 / datetime / ISO strings / epoch numbers -> int64 epoch seconds
+    ts = np.asarray(ts)
+    if ts.dtype.kind in "iuf":
+        return ts.astype(np.int64)
+    return ts.astype("datetime64[s]").astype(np.int64)
+
+
+class SeriesStore:
+    """Sensor history as fixed-width columns in append-only files.
+
+    Appends are a few bytes per column, and the `ts`, `temp` and `moist`
+    properties are zero-copy memory-mapped views, so opening years of readings
+    costs the same as opening a day's worth. Rollups live in the same directory.
+    """
+
+    def __init__(self, path=STORE_DIR, rollups=True):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._paths = {name: os.path.join(path, f"{name}.bin") for name, _ in COLUMNS}
+        # Readers only ever see the complete rows; the first write repairs
+        self._repaired = False
+        self._files = {name: open(p, "ab") for name, p in self._paths.items()}
+        self._rows = self._stored_rows()
+        self._views = None
+        self._last = int(self.ts[-1]) if self._rows else None
+        # Minute / hour / day aggregates for long views, updated on append
+        self.rollups = Rollups(self) if rollups else None
+        # Range statistics index, built on first use and kept current after
+        self._index = None
+
+    def _stored_rows(self):
+        return min(os.path.getsize(self._paths[name]) // dtype.itemsize
+                   if os.path.exists(self._paths[name]) else 0
+                   for name, dtype in COLUMNS)
+
+    def _repair(self):
+        # A crash between column writes leaves one row half written; drop it.
+        # Only the writing process does this: for a reader the partial row may
+        # be a write still in progress, and cutting it would misalign columns
+        rows = self._stored_rows()
+        for name, dtype in COLUMNS:
+            path = self._paths[name]
+            if os.path.exists(path) and os.path.getsize(path) != rows * dtype.itemsize:
+                logging.warning(f"Truncating {path} to {rows} complete rows.")
+                os.truncate(path, rows * dtype.itemsize)
+
+    def __len__(self):
+        return self._rows
+
+    @property
+    def version(self):
+        # Grows with every append; handy as a cache key
+        return self._rows
+
+    def refresh(self):
+        # Pick up rows appended by another process
+        rows = self._stored_rows()
+        if rows != self._rows:
+            self._rows = rows
+            self._views = None
+            self._last = int(self.ts[-1]) if rows else None
+            if self.rollups is not None:
+                self.rollups.refresh()
+            self._update_index()
+
+    def _columns(self):
+        if self._views is None:
+            self._views = {name: np.memmap(self._paths[name], dtype=dtype, mode="r", shape=(self._rows,))
+                           if self._rows else np.empty(0, dtype)
+                           for name, dtype in COLUMNS}
+        return self._views
+
+    @property
+    def ts(self):
+        return self._columns()["ts"]
+
+    @property
+    def temp(self):
+        return self._columns()["temp"]
+
+    @property
+    def moist(self):
+        return self._columns()["moist"]
+
+    def bounds(self, start=None, end=None):
+        # Row range [lo, hi) of readings with start <= ts < end, by binary search
+        ts = self.ts
+        lo = 0 if start is None else int(np.searchsorted(ts, to_seconds(start), side="left"))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, to_seconds(end), side="left"))
+        return lo, max(lo, hi)
+
+    def window(self, start=None, end=None):
+        lo, hi = self.bounds(start, end)
+        columns = self._columns()
+        return Window(*(columns[name][lo:hi] for name, _ in COLUMNS))
+
+    def last_hours(self, hours, end=None):
+        # Readings in the `hours` before `end`, by default up to the newest one
+        if end is None:
+            end = int(self.ts[-1]) + 1 if self._rows else 0
+        end = int(to_seconds(end))
+        return self.window(end - int(hours * 3600), end)
+
+    def stats(self, start=None, end=None):
+        # {"temp": RangeStats, "moist": RangeStats} over [start, end) without
+        # scanning: O(1) count and mean, O(log n) min and max
+        columns = self._columns()
+        if self._index is None:
+            self._index = {name: SeriesIndex(columns[name]) for name in ("temp", "moist")}
+        lo, hi = self.bounds(start, end)
+        return {name: index.stats(columns[name], lo, hi) for name, index in self._index.items()}
+
+    def _update_index(self):
+        if self._index is not None:
+            columns = self._columns()
+            for name, index in self._index.items():
+                index.update(columns[name])
+
+    def append(self, ts, temp, moist):
+        # One reading; timestamps must not go backwards
+        t = int(to_seconds(ts))
+        if self._last is not None and t < self._last:
+            raise ValueError(f"Timestamp {t} is older than the last stored reading {self._last}.")
+        self._write(np.array([t]), np.array([temp]), np.array([moist]))
+
+    def extend(self, ts, temp, moist):
+        # Many readings at once, already in time order
+        ts = to_seconds(ts)
+        if len(ts) == 0:
+            return
+        if np.any(np.diff(ts) < 0) or (self._last is not None and ts[0] < self._last):
+            raise ValueError("Readings must be appended in time order.")
+        self._write(ts, np.asarray(temp), np.asarray(moist))
+
+    def _write(self, ts, temp, moist):
+        if not self._repaired:
+            self._repair()
+            self._repaired = True
+        for (name, dtype), values in zip(COLUMNS, (ts, temp, moist)):
+            f = self._files[name]
+            f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+            f.flush()
+        self._rows += len(ts)
+        self._views = None
+        self._last = int(ts[-1])
+        temp, moist = np.asarray(temp, dtype=np.float32), np.asarray(moist, dtype=np.float32)
+        if self.rollups is not None:
+            self.rollups.extend(ts, temp, moist)
+        self._update_index()
+
+    def close(self):
+        self._views = None
+        if self.rollups is not None:
+            self.rollups.close()
+        for f in self._files.values():
+            f.close()
+
+
+def import_csv(store, csv_path=CSV_PATH):
+    # One-time import of the Timestamp,Temp,Moist CSV, sorted by time
+    with open(csv_path, newline="") as f:
+        rows = [row for row in csv.DictReader(f) if row["Timestamp"]]
+    ts = to_seconds(np.array([row["Timestamp"] for row in rows], dtype="datetime64[s]"))
+    temp = np.array([float(row["Temp"]) for row in rows], dtype=np.float32)
+    moist = np.array([float(row["Moist"]) for row in rows], dtype=np.float32)
+    order = np.argsort(ts, kind="stable")
+    store.extend(ts[order], temp[order], moist[order])
+    logging.info(f"Imported {len(rows)} readings from {csv_path}.")
+    return len(rows)
+
+
+def open_store(path=STORE_DIR, csv_path=CSV_PATH):
+    # The default store, seeded from the CSV the first time it is opened
+    store = SeriesStore(path)
+    if not len(store) and csv_path and os.path.exists(csv_path):
+        import_csv(store, csv_path)
+    return store